@@ -252,7 +252,9 @@ class ConversionJobService {
 
           const ytResult = await ytmusicService.searchTrack(
             track.title,
-            track.artist
+            track.artist,
+            conversionId,
+            track.durationMs
           );
 
           if (ytResult) {
@@ -263,6 +265,9 @@ class ConversionJobService {
             conversionTrack.error = "No matching track found on YouTube Music";
           }
         } catch (error: any) {
+          if (error.message === "CONVERSION_CANCELLED") {
+            throw error;
+          }
           conversionTrack.error = error.message;
           console.error(
             `❌ ${conversionId}: Error processing track "${track.title}":`,
@@ -183,13 +183,19 @@ class SpotifyService {
 
   getSimplifiedTracks(
     playlist: SpotifyPlaylist
-  ): Array<{ title: string; artist: string; spotifyUrl: string }> {
+  ): Array<{
+    title: string;
+    artist: string;
+    spotifyUrl: string;
+    durationMs: number;
+  }> {
     return playlist.tracks.items
       .filter(item => item.track && item.track.name) // Filter out null/invalid tracks
       .map(item => ({
         title: item.track.name,
         artist: item.track.artists.map(artist => artist.name).join(", "),
         spotifyUrl: item.track.external_urls.spotify,
+        durationMs: item.track.duration_ms,
       }));
   }
 }
@@ -10,7 +10,9 @@ class YTMusicService {
 
   async searchTrack(
     title: string,
-    artist: string
+    artist: string,
+    conversionId?: string,
+    durationMs?: number
   ): Promise<YTMusicSearchResult | null> {
     try {
       const searchQuery = `${title} ${artist}`.trim();
@@ -22,6 +24,8 @@ class YTMusicService {
           query: searchQuery,
           title,
           artist,
+          conversionId,
+          durationMs,
         },
         {}
       );
@@ -34,6 +38,11 @@ class YTMusicService {
         return null;
       }
     } catch (error: any) {
+      if (error.response?.status === 409 && error.response?.data?.cancelled) {
+        console.log("🛑 Search skipped - conversion was cancelled");
+        throw new Error("CONVERSION_CANCELLED");
+      }
+
       console.error(
         `❌ Error searching for "${title}" by "${artist}":`,
         error.message
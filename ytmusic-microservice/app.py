@@ -1,22 +1,40 @@
 import os
 import json
+import uuid
 import logging
 import time
+_IMPORT_STARTED = time.time()
 import base64
-from flask import Flask, request, jsonify
+import threading
+import contextvars
+from flask import Flask, Response, request, jsonify, stream_with_context, g
 from flask_cors import CORS
-from typing import Optional, Dict, Any, List
-import re
-from difflib import SequenceMatcher
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import firebase_admin
 from firebase_admin import credentials, firestore
 
-# Load environment variables from .env file
+# Load environment variables from .env file, before the project modules below
+# read their settings (matcher backend, duration tolerance, metrics dir) at import
 from dotenv import load_dotenv
 load_dotenv()
 
+import metrics
+from match_cache import MatchCache
+from shared_cache import SharedMatchCache
+from match_trace import MatchTracer, current_request_id
+from matcher import normalize_string, find_best_match, parse_duration, fallback_queries, artist_similarity
+from singleflight import SingleFlight
+from rate_limiter import AdaptiveRateLimiter
+from resilience import HedgedCaller, CircuitBreaker, CircuitOpenError
+from client_pool import ClientPool, build_session
+from token_manager import TokenManager, refresh_with_google
+from cancellations import CancellationRegistry
+from jobs import JobRunner, ProgressWriter
+from playlist_sync import plan_sync
+from playlist_builder import PlaylistBuilder, BuildCancelled, FileCheckpointStore, FirestoreCheckpointStore
+
 
 try:
     from ytmusicapi import YTMusic
@@ -31,10 +49,132 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
+# eager: initialize everything at import (exit on failure)
+# lazy: initialize on first request that needs it
+# background: start initializing on a warm-up thread right away
+STARTUP_MODE = os.getenv('STARTUP_MODE', 'eager').lower()
+# Set by gunicorn.conf.py when the app is preloaded in the master; warm-up then runs per worker
+DEFER_WARMUP = os.getenv('YTMUSIC_DEFER_WARMUP', 'false').lower() == 'true'
+INIT_RETRY_INTERVAL = float(os.getenv('INIT_RETRY_INTERVAL', '30'))
+
 
 ytmusic: Optional[YTMusic] = None
 db: Optional[Any] = None  # Use Any instead of firestore.Client to avoid import issues
 
+# Bounded worker pool shared by batch searches in this process
+SEARCH_BATCH_MAX_WORKERS = int(os.getenv('SEARCH_BATCH_MAX_WORKERS', '4'))
+SEARCH_BATCH_MAX_ITEMS = int(os.getenv('SEARCH_BATCH_MAX_ITEMS', '500'))
+SEARCH_STREAM_MAX_ITEMS = int(os.getenv('SEARCH_STREAM_MAX_ITEMS', '5000'))
+# A sync gunicorn worker doesn't heartbeat while streaming, so it is killed once a
+# stream outlives GUNICORN_TIMEOUT (300s ~ 1000 tracks at a few searches/s); longer
+# lists need a gthread or gevent worker
+SEARCH_STREAM_SYNC_MAX_ITEMS = int(os.getenv('SEARCH_STREAM_SYNC_MAX_ITEMS', '1000'))
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_BATCH_MAX_WORKERS, thread_name_prefix='search')
+
+# Persistent match cache shared by all workers on this host
+MATCH_CACHE_ENABLED = os.getenv('MATCH_CACHE_ENABLED', 'true').lower() == 'true'
+MATCH_CACHE_PATH = os.getenv('MATCH_CACHE_PATH', 'cache/match_cache.sqlite3')
+MATCH_CACHE_TTL = int(os.getenv('MATCH_CACHE_TTL', str(7 * 24 * 3600)))
+MATCH_CACHE_NEGATIVE_TTL = int(os.getenv('MATCH_CACHE_NEGATIVE_TTL', str(6 * 3600)))
+MATCH_CACHE_MAX_ENTRIES = int(os.getenv('MATCH_CACHE_MAX_ENTRIES', '50000'))
+match_cache: Optional[MatchCache] = None
+
+# Second cache tier in Firestore, shared by every instance
+SHARED_CACHE_ENABLED = os.getenv('SHARED_CACHE_ENABLED', 'true').lower() == 'true'
+SHARED_CACHE_COLLECTION = os.getenv('SHARED_CACHE_COLLECTION', 'match-cache')
+SHARED_CACHE_FLUSH_INTERVAL = float(os.getenv('SHARED_CACHE_FLUSH_INTERVAL', '2'))
+shared_cache: Optional[SharedMatchCache] = None
+cache_tier_counts = {'local': 0, 'shared': 0, 'upstream': 0}
+# Outcome of the last bulk prefetch per key ('hit' or 'miss'), consumed by the next lookup
+_prefetched: Dict[str, str] = {}
+PREFETCH_MEMO_MAX = 20000
+_cache_tier_lock = threading.Lock()
+
+# Coalesces identical concurrent searches within this process
+search_flight = SingleFlight()
+
+# Adaptive limiter for every YouTube Music call, shared by all workers on the host
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_STATE_PATH = os.getenv('RATE_LIMIT_STATE_PATH', 'cache/ytmusic_rate_limit.bin')
+rate_limiter: Optional[AdaptiveRateLimiter] = None
+
+# Pool of YTMusic clients with tuned keep-alive sessions
+YTMUSIC_POOL_SIZE = int(os.getenv('YTMUSIC_POOL_SIZE', '4'))
+YTMUSIC_POOL_TIMEOUT = float(os.getenv('YTMUSIC_POOL_TIMEOUT', '30'))
+YTMUSIC_HTTP_POOL_MAXSIZE = int(os.getenv('YTMUSIC_HTTP_POOL_MAXSIZE', '10'))
+YTMUSIC_HTTP_RETRIES = int(os.getenv('YTMUSIC_HTTP_RETRIES', '2'))
+YTMUSIC_HTTP_TIMEOUT = float(os.getenv('YTMUSIC_HTTP_TIMEOUT', '30'))
+client_pool: Optional[ClientPool] = None
+
+# Proactive OAuth refresh, coordinated across workers
+TOKEN_REFRESH_MARGIN = float(os.getenv('TOKEN_REFRESH_MARGIN', '600'))
+TOKEN_CHECK_INTERVAL = float(os.getenv('TOKEN_CHECK_INTERVAL', '60'))
+token_manager: Optional[TokenManager] = None
+
+# Cancelled conversion IDs, pushed from Firestore instead of read per request
+CANCELLATION_LISTENER = os.getenv('CANCELLATION_LISTENER', 'true').lower() == 'true'
+CANCELLATION_POLL_INTERVAL = float(os.getenv('CANCELLATION_POLL_INTERVAL', '5'))
+# Only cancellations updated within this many seconds are loaded and kept
+CANCELLATION_RETENTION = float(os.getenv('CANCELLATION_RETENTION', os.getenv('JOBS_RETENTION', '3600')))
+cancellations: Optional[CancellationRegistry] = None
+
+# Per-call deadline, optional hedging and circuit breaker for ytmusic.search
+SEARCH_DEADLINE = float(os.getenv('SEARCH_DEADLINE', '20'))
+# SEARCH_INITIAL_CANDIDATES > 0 scores only the top N first and the rest of the page only if none
+# clears the threshold (can change which result wins); 0 scores the whole page, as before.
+# SEARCH_WIDEN_LIMIT > SEARCH_RESULT_LIMIT re-searches for more results after that
+SEARCH_RESULT_LIMIT = int(os.getenv('SEARCH_RESULT_LIMIT', '10'))
+SEARCH_INITIAL_CANDIDATES = int(os.getenv('SEARCH_INITIAL_CANDIDATES', '0'))
+SEARCH_WIDEN_LIMIT = int(os.getenv('SEARCH_WIDEN_LIMIT', '0'))
+
+# Per-candidate match scores go to an in-memory ring buffer (see /explain-match), not the log;
+# a sampled fraction of traces is logged at INFO, and all of them when match_trace logs at DEBUG
+MATCH_TRACE_CAPACITY = int(os.getenv('MATCH_TRACE_CAPACITY', '500'))
+MATCH_TRACE_SAMPLE_RATE = float(os.getenv('MATCH_TRACE_SAMPLE_RATE', '0.01'))
+match_tracer = MatchTracer(MATCH_TRACE_CAPACITY, MATCH_TRACE_SAMPLE_RATE)
+
+# Fallback query variants for tracks that don't match; exhausted tracks are cached as negative for longer
+SEARCH_FALLBACK_ENABLED = os.getenv('SEARCH_FALLBACK_ENABLED', 'true').lower() == 'true'
+SEARCH_FALLBACK_MIN_ARTIST = float(os.getenv('SEARCH_FALLBACK_MIN_ARTIST', '0.5'))
+SEARCH_FALLBACK_NEGATIVE_TTL = int(os.getenv('SEARCH_FALLBACK_NEGATIVE_TTL', str(7 * 24 * 3600)))
+fallback_executor = ThreadPoolExecutor(max_workers=SEARCH_BATCH_MAX_WORKERS * 3, thread_name_prefix='fallback')
+fallback_stats: Dict[str, Any] = {'attempts': 0, 'wins': {}, 'exhausted': 0, 'errors': 0}
+_fallback_stats_lock = threading.Lock()
+SEARCH_HEDGE_ENABLED = os.getenv('SEARCH_HEDGE_ENABLED', 'false').lower() == 'true'
+search_caller = HedgedCaller(
+    max_workers=SEARCH_BATCH_MAX_WORKERS * 2 + 2,
+    deadline=SEARCH_DEADLINE,
+    hedge=SEARCH_HEDGE_ENABLED,
+    hedge_percentile=float(os.getenv('SEARCH_HEDGE_PERCENTILE', '95')),
+    min_hedge_delay=float(os.getenv('SEARCH_HEDGE_MIN_DELAY', '0.5'))
+)
+search_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5')),
+    reset_timeout=float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))
+)
+
+# Server-side conversion jobs; progress goes to conversion-jobs in batched writes
+JOBS_MAX_CONCURRENT = int(os.getenv('JOBS_MAX_CONCURRENT', '3'))
+JOBS_MAX_QUEUED = int(os.getenv('JOBS_MAX_QUEUED', '10'))
+JOBS_MAX_TRACKS = int(os.getenv('JOBS_MAX_TRACKS', '5000'))
+JOBS_PROGRESS_FLUSH_INTERVAL = float(os.getenv('JOBS_PROGRESS_FLUSH_INTERVAL', '2'))
+JOBS_RETENTION = float(os.getenv('JOBS_RETENTION', '3600'))
+progress_writer: Optional[ProgressWriter] = None
+
+# Large playlists are built in chunks with a checkpoint after each (resumable)
+PLAYLIST_CHUNK_SIZE = int(os.getenv('PLAYLIST_CHUNK_SIZE', '100'))
+PLAYLIST_CHUNK_THRESHOLD = int(os.getenv('PLAYLIST_CHUNK_THRESHOLD', '200'))
+PLAYLIST_CHUNK_RETRIES = int(os.getenv('PLAYLIST_CHUNK_RETRIES', '2'))
+PLAYLIST_CHECKPOINT_DIR = os.getenv('PLAYLIST_CHECKPOINT_DIR', 'cache/playlist_builds')
+PLAYLIST_CHECKPOINT_TTL = float(os.getenv('PLAYLIST_CHECKPOINT_TTL', str(7 * 24 * 3600)))
+_file_checkpoints: Optional[FileCheckpointStore] = None
+
+# Re-sync: local matching against the existing playlist before any search
+SYNC_MAX_TRACKS = int(os.getenv('SYNC_MAX_TRACKS', '5000'))
+SYNC_LOCAL_MATCH_THRESHOLD = float(os.getenv('SYNC_LOCAL_MATCH_THRESHOLD', '0.8'))
+SYNC_LOCAL_MIN_ARTIST = float(os.getenv('SYNC_LOCAL_MIN_ARTIST', '0.6'))
+SYNC_MAX_FUZZY_PAIRS = int(os.getenv('SYNC_MAX_FUZZY_PAIRS', '200000'))
+
 def init_firestore():
     """Initialize Firestore connection"""
     global db
@@ -87,9 +227,192 @@ def init_firestore():
         db = None
         return False
 
+def init_cancellations():
+    """Start tracking cancelled conversions (requires Firestore)"""
+    global cancellations
+    
+    if not db:
+        return False
+    
+    try:
+        cancellations = CancellationRegistry(db, poll_interval=CANCELLATION_POLL_INTERVAL,
+                                             retention=CANCELLATION_RETENTION)
+        cancellations.start(use_listener=CANCELLATION_LISTENER)
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Cancellation tracking unavailable: {str(e)}")
+        cancellations = None
+        return False
+
+def init_progress_writer():
+    """Start the batched conversion-jobs progress writer (requires Firestore)"""
+    global progress_writer
+    
+    if not db:
+        return False
+    
+    progress_writer = ProgressWriter(
+        db,
+        is_cancelled=is_conversion_cancelled,
+        flush_interval=JOBS_PROGRESS_FLUSH_INTERVAL
+    )
+    job_runner.progress = progress_writer
+    return True
+
+def is_conversion_cancelled(conversion_id: Optional[str]) -> bool:
+    """Cheap in-memory check whether a conversion was cancelled"""
+    if not conversion_id or not ensure_firestore() or not cancellations:
+        return False
+    return cancellations.is_cancelled(conversion_id)
+
+def init_rate_limiter():
+    """Set up the shared YouTube Music rate limiter"""
+    global rate_limiter
+    
+    if not RATE_LIMIT_ENABLED:
+        logger.info("ℹ️ YouTube Music rate limiter disabled")
+        return False
+    
+    try:
+        rate_limiter = AdaptiveRateLimiter(
+            RATE_LIMIT_STATE_PATH,
+            initial_rate=float(os.getenv('RATE_LIMIT_INITIAL_RATE', '5')),
+            min_rate=float(os.getenv('RATE_LIMIT_MIN_RATE', '0.5')),
+            max_rate=float(os.getenv('RATE_LIMIT_MAX_RATE', '20')),
+            burst=float(os.getenv('RATE_LIMIT_BURST', '5')),
+            increase=float(os.getenv('RATE_LIMIT_INCREASE', '0.1')),
+            backoff=float(os.getenv('RATE_LIMIT_BACKOFF', '0.5')),
+            max_wait=float(os.getenv('RATE_LIMIT_MAX_WAIT', '60'))
+        )
+        logger.info(f"✅ YouTube Music rate limiter ready ({RATE_LIMIT_STATE_PATH})")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Rate limiter initialization failed: {str(e)}")
+        rate_limiter = None
+        return False
+
+def _pooled_call(method: str, *args, **kwargs):
+    """Check a client out of the pool and call one of its methods"""
+    if client_pool is None:
+        return getattr(ytmusic, method)(*args, **kwargs)
+    with client_pool.client() as client:
+        return getattr(client, method)(*args, **kwargs)
+
+def _upstream_attempt(method: str, *args, **kwargs):
+    """One ytmusic.<method> call whose rate limiter token has already been taken"""
+    with metrics.timer(metrics.UPSTREAM_CALL_SECONDS, method=method):
+        if rate_limiter:
+            return rate_limiter.run(_pooled_call, method, *args, **kwargs)
+        return _pooled_call(method, *args, **kwargs)
+
+def call_ytmusic(method: str, *args, **kwargs):
+    """Invoke ytmusic.<method> on a pooled client through the shared rate limiter"""
+    if rate_limiter:
+        rate_limiter.acquire()
+    return _upstream_attempt(method, *args, **kwargs)
+
+def upstream_search(query: str, limit: int = 10) -> List[Dict]:
+    """ytmusic.search with the circuit breaker, deadline and hedging applied.
+
+    The rate limiter wait happens first, so only the upstream call itself
+    counts toward the deadline and hedge timing, and a hedge only starts
+    when a token is free right away.
+    """
+    with metrics.timer(metrics.SEARCH_SECONDS):
+        search_breaker.before_call()
+        if rate_limiter:
+            try:
+                rate_limiter.acquire()
+            except Exception:
+                # Our own backpressure, not an upstream failure
+                search_breaker.on_abort()
+                raise
+        try:
+            results = search_caller.call(
+                _upstream_attempt, 'search', query, filter='songs', limit=limit,
+                hedge_gate=rate_limiter.try_acquire if rate_limiter else None
+            )
+        except Exception:
+            search_breaker.on_failure()
+            raise
+        search_breaker.on_success()
+        return results
+
+def match_results(title: str, artist: str, results: List[Dict], duration: Optional[float] = None,
+                  window: int = 0, label: str = 'primary', force_trace: bool = False) -> Optional[Dict]:
+    """find_best_match with its scoring time, best score and match trace recorded"""
+    trace = match_tracer.start(title, artist, duration, window, label, force=force_trace)
+    scores: List[float] = []
+    started = time.perf_counter()
+    with metrics.timer(metrics.MATCH_SCORING_SECONDS):
+        match = find_best_match(title, artist, results, duration, window, observe=scores.append, trace=trace)
+    if scores:
+        metrics.MATCH_SCORE.observe(scores[0])
+    match_tracer.finish(trace, match, scores[0] if scores else 0.0, time.perf_counter() - started)
+    return match
+
+def submit_in_context(executor: ThreadPoolExecutor, fn, *args):
+    """executor.submit that keeps the caller's request ID for match traces"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+def init_match_cache():
+    """Open the on-disk match cache"""
+    global match_cache
+    
+    if not MATCH_CACHE_ENABLED:
+        logger.info("ℹ️ Match cache disabled")
+        return False
+    
+    try:
+        match_cache = MatchCache(
+            MATCH_CACHE_PATH,
+            ttl=MATCH_CACHE_TTL,
+            negative_ttl=MATCH_CACHE_NEGATIVE_TTL,
+            max_entries=MATCH_CACHE_MAX_ENTRIES
+        )
+        logger.info(f"✅ Match cache ready at {MATCH_CACHE_PATH}")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Match cache initialization failed: {str(e)}")
+        match_cache = None
+        return False
+
+def init_shared_cache():
+    """Start the Firestore match cache tier (requires Firestore)"""
+    global shared_cache
+    
+    if not SHARED_CACHE_ENABLED or not db:
+        return False
+    
+    try:
+        shared_cache = SharedMatchCache(
+            db,
+            SHARED_CACHE_COLLECTION,
+            ttl=MATCH_CACHE_TTL,
+            negative_ttl=MATCH_CACHE_NEGATIVE_TTL,
+            flush_interval=SHARED_CACHE_FLUSH_INTERVAL
+        )
+        logger.info(f"✅ Shared match cache ready (Firestore '{SHARED_CACHE_COLLECTION}')")
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Shared match cache unavailable: {str(e)}")
+        shared_cache = None
+        return False
+
+def build_ytmusic_clients(oauth_file: str, **kwargs) -> List[YTMusic]:
+    """Create YTMUSIC_POOL_SIZE clients from the same credentials, each with its own session"""
+    return [
+        YTMusic(
+            oauth_file,
+            requests_session=build_session(YTMUSIC_HTTP_POOL_MAXSIZE, YTMUSIC_HTTP_RETRIES, YTMUSIC_HTTP_TIMEOUT),
+            **kwargs
+        )
+        for _ in range(max(1, YTMUSIC_POOL_SIZE))
+    ]
+
 def init_ytmusic():
     """Initialize YTMusic with OAuth authentication using proper ytmusicapi OAuth classes"""
-    global ytmusic
+    global ytmusic, client_pool, token_manager
     
     try:
         oauth_file = os.getenv('YTMUSIC_OAUTH_FILE', 'auth/oauth.json')
@@ -124,210 +447,184 @@ def init_ytmusic():
         
 
         try:
-            from ytmusicapi.auth.oauth import OAuthCredentials, RefreshingToken
+            from ytmusicapi.auth.oauth import OAuthCredentials
             
 
             oauth_credentials = OAuthCredentials(
                 client_id=client_id,
                 client_secret=client_secret
             )
-            
-
-            with open(oauth_file, 'r') as f:
-                token_data = json.load(f)
-            
-
-            refreshing_token = RefreshingToken(
-                scope=token_data.get('scope', 'https://www.googleapis.com/auth/youtube'),
-                token_type=token_data.get('token_type', 'Bearer'),
-                access_token=token_data['access_token'],
-                refresh_token=token_data['refresh_token'],
-                expires_at=token_data.get('expires_at', 0),
-                expires_in=token_data.get('expires_in', 3600),
-                credentials=oauth_credentials,
-                _local_cache=oauth_file  # This will auto-save token updates
-            )
-            
-
-            refreshing_token.store_token(oauth_file)
-            
-
-            ytmusic = YTMusic(oauth_file, oauth_credentials=oauth_credentials)
-            logger.info("✅ YTMusic initialized with RefreshingToken (auto-refresh enabled)")
+            refresh_fn = oauth_credentials.refresh_token
+            client_kwargs = {'oauth_credentials': oauth_credentials}
             
         except ImportError as e:
             logger.warning(f"⚠️ ytmusicapi OAuth classes not available: {str(e)}")
             logger.warning("⚠️ Falling back to manual token refresh...")
             
+            def refresh_fn(refresh_token):
+                return refresh_with_google(refresh_token, client_id, client_secret)
+            client_kwargs = {}
+        
+        def timed_refresh(refresh_token):
+            with metrics.timer(metrics.TOKEN_REFRESH_SECONDS):
+                return refresh_fn(refresh_token)
+        
+        # Refresh up front if needed; only one worker does it, under a file lock
+        token_manager = TokenManager(oauth_file, timed_refresh, TOKEN_REFRESH_MARGIN, TOKEN_CHECK_INTERVAL)
+        if not token_manager.ensure_fresh(block=True):
+            logger.error("❌ OAuth token has expired and could not be refreshed. Please re-authenticate.")
+            return False
+        
+        clients = build_ytmusic_clients(oauth_file, **client_kwargs)
+        token_manager.attach(clients)
+        token_manager.start()
+        logger.info("✅ YTMusic initialized with background token refresh")
+        
+        ytmusic = clients[0]
+        client_pool = ClientPool(clients, YTMUSIC_POOL_TIMEOUT)
+        logger.info(f"✅ YTMusic client pool ready with {len(clients)} clients")
+        return True
+        
+    except Exception as e:
+        logger.error(f"❌ OAuth authentication failed: {str(e)}")
+        return False
 
-            with open(oauth_file, 'r') as f:
-                oauth_data = json.load(f)
-            
-
-            expires_at = oauth_data.get('expires_at', 0)
-            current_time = time.time()
-            
-            if current_time > expires_at:
-                logger.warning("⚠️ OAuth token has expired, attempting to refresh...")
-                
-
-                refresh_token = oauth_data.get('refresh_token')
-                if not refresh_token:
-                    logger.error("❌ No refresh token available. Please re-authenticate.")
-                    return False
-                
-
-                import requests
-                
-                token_refresh_data = {
-                    'grant_type': 'refresh_token',
-                    'refresh_token': refresh_token,
-                    'client_id': client_id,
-                    'client_secret': client_secret
-                }
-                
-                try:
-                    response = requests.post(
-                        'https://oauth2.googleapis.com/token',
-                        data=token_refresh_data
-                    )
-                    
-                    if response.status_code == 200:
-                        token_data = response.json()
-                        
-
-                        oauth_data['access_token'] = token_data['access_token']
-                        oauth_data['expires_in'] = token_data['expires_in']
-                        oauth_data['expires_at'] = current_time + token_data['expires_in']
-                        
-
-                        with open(oauth_file, 'w') as f:
-                            json.dump(oauth_data, f, indent=2)
-                        
-                        logger.info("✅ OAuth token refreshed successfully")
-                    else:
-                        logger.error(f"❌ Token refresh failed: {response.status_code} - {response.text}")
-                        return False
-                        
-                except Exception as e:
-                    logger.error(f"❌ Token refresh error: {str(e)}")
-                    return False
-            
+def verify_ytmusic_auth():
+    """Make one cheap authenticated call to confirm the OAuth token works"""
+    try:
 
-            ytmusic = YTMusic(oauth_file)
-            logger.info("✅ YTMusic initialized with oauth file (manual refresh)")
+        test_result = call_ytmusic('get_library_playlists', limit=1)
+        logger.info("✅ YouTube Music authentication verified")
+        return True
         
+    except Exception as e:
+        logger.error(f"❌ Authentication verification failed: {str(e)}")
+        if "401" in str(e) or "unauthorized" in str(e).lower():
+            logger.error("❌ Authentication failed - token may be invalid. Please re-authenticate.")
+        return False
 
-        try:
+# Startup state: which services are ready and how long each step took
+startup_timings: Dict[str, float] = {}
+services_ready = {'firestore': False, 'ytmusic': False}
+_init_lock = threading.Lock()
+_last_init_attempt = {'firestore': 0.0, 'ytmusic': 0.0}
+_warmup_thread: Optional[threading.Thread] = None
+
+def _timed(name: str, fn):
+    started = time.time()
+    result = fn()
+    startup_timings[name] = round(time.time() - started, 3)
+    return result
 
-            test_result = ytmusic.get_library_playlists(limit=1)
-            logger.info("✅ YouTube Music authentication verified")
+def _init_service(name: str, init_fn) -> bool:
+    """Initialize a service once, retrying at most every INIT_RETRY_INTERVAL seconds"""
+    if services_ready[name]:
+        return True
+    with _init_lock:
+        if services_ready[name]:
             return True
-            
-        except Exception as e:
-            logger.error(f"❌ Authentication verification failed: {str(e)}")
-            if "401" in str(e) or "unauthorized" in str(e).lower():
-                logger.error("❌ Authentication failed - token may be invalid. Please re-authenticate.")
+        if time.time() - _last_init_attempt[name] < INIT_RETRY_INTERVAL:
             return False
-        
-    except Exception as e:
-        logger.error(f"❌ OAuth authentication failed: {str(e)}")
+        _last_init_attempt[name] = time.time()
+        services_ready[name] = init_fn()
+        if services_ready[name] and name == 'ytmusic' and 'ready_after' not in startup_timings:
+            startup_timings['ready_after'] = round(time.time() - _IMPORT_STARTED, 3)
+    return services_ready[name]
+
+def _init_firestore_and_listeners() -> bool:
+    if not _timed('firestore_init', init_firestore):
         return False
+    init_cancellations()
+    init_progress_writer()
+    init_shared_cache()
+    return True
 
-def normalize_string(s: str) -> str:
-    """Normalize string for better matching - less aggressive normalization"""
-    # Keep some punctuation that might be important for matching
-    s = re.sub(r'[^\w\s\-\'\&]', '', s.lower().strip())
-    # Remove extra whitespace
-    s = ' '.join(s.split())
-    return s
-
-def calculate_similarity(str1: str, str2: str) -> float:
-    """Calculate similarity between two strings"""
-    norm1 = normalize_string(str1)
-    norm2 = normalize_string(str2)
-    return SequenceMatcher(None, norm1, norm2).ratio()
-
-def find_best_match(query_title: str, query_artist: str, results: List[Dict]) -> Optional[Dict]:
-    """Find the best matching track from search results using improved similarity scoring"""
-    if not results:
-        return None
-    
-    best_match = None
-    best_score = 0.0
-    
-    logger.info(f"🔍 Finding best match for: '{query_title}' by '{query_artist}'")
-    
-    for i, result in enumerate(results):
-        try:
-            # Extract title and artists
-            result_title = result.get('title', '').strip()
-            result_artists = result.get('artists', [])
-            
-            if not result_title:
-                continue
-            
-            # Get artist names
-            artist_names = []
-            for artist in result_artists:
-                if isinstance(artist, dict):
-                    name = artist.get('name', '')
-                    if name:
-                        artist_names.append(name)
-                elif isinstance(artist, str):
-                    artist_names.append(artist)
-            
-            result_artist = ', '.join(artist_names)
-            
-            # Calculate similarity scores
-            title_similarity = calculate_similarity(query_title, result_title)
-            
-            # Improved artist matching - check individual artists too
-            artist_similarity = calculate_similarity(query_artist, result_artist)
-            
-            # Also check if any individual artist from query matches any result artist
-            query_artists = [a.strip() for a in query_artist.split(',')]
-            individual_artist_scores = []
-            
-            for qa in query_artists:
-                for artist_name in artist_names:
-                    score = calculate_similarity(qa, artist_name)
-                    individual_artist_scores.append(score)
-            
-            # Use the best individual artist match if it's better
-            best_individual_artist = max(individual_artist_scores) if individual_artist_scores else 0.0
-            artist_similarity = max(artist_similarity, best_individual_artist)
-            
-            # Combined score with slightly more emphasis on title
-            combined_score = (title_similarity * 0.75) + (artist_similarity * 0.25)
-            
-            # Bonus for exact title match (case insensitive)
-            if normalize_string(query_title) == normalize_string(result_title):
-                combined_score += 0.1
-            
-            logger.info(f"🔍 Result {i+1}: '{result_title}' by '{result_artist}'")
-            logger.info(f"   Title sim: {title_similarity:.3f}, Artist sim: {artist_similarity:.3f}, Combined: {combined_score:.3f}")
-            
-            if combined_score > best_score:
-                best_score = combined_score
-                best_match = result
-        
-        except Exception as e:
-            logger.error(f"❌ Error processing search result: {str(e)}")
-            continue
-    
-    # Lower threshold for better matching (0.3 instead of 0.4)
-    if best_score >= 0.3 and best_match:
-        match_title = best_match.get('title', 'Unknown')
-        match_artists = ', '.join([a.get('name', '') if isinstance(a, dict) else str(a) for a in best_match.get('artists', [])])
-        logger.info(f"✅ Best match found with score {best_score:.3f}: '{match_title}' by '{match_artists}'")
-        return best_match
-    else:
-        logger.info(f"❌ No match above threshold 0.3 (best score: {best_score:.3f})")
-        return None
+def _init_ytmusic_and_verify() -> bool:
+    return _timed('ytmusic_init', init_ytmusic) and _timed('auth_verification', verify_ytmusic_auth)
+
+def ensure_ytmusic() -> bool:
+    """True once YTMusic is ready, initializing it on first use outside eager mode"""
+    if services_ready['ytmusic'] or STARTUP_MODE == 'eager':
+        return services_ready['ytmusic']
+    return _init_service('ytmusic', _init_ytmusic_and_verify)
+
+def ensure_firestore() -> bool:
+    """True once Firestore is connected, initializing it on first use outside eager mode"""
+    if services_ready['firestore'] or STARTUP_MODE == 'eager':
+        return services_ready['firestore']
+    return _init_service('firestore', _init_firestore_and_listeners)
+
+def _warm_up():
+    ensure_firestore()
+    ensure_ytmusic()
+    logger.info(f"🔥 Warm-up finished: {startup_timings}")
+
+def start_warmup():
+    """Initialize services on a background thread (called per worker)"""
+    global _warmup_thread
+    if STARTUP_MODE != 'background' or (_warmup_thread and _warmup_thread.is_alive()):
+        return
+    _warmup_thread = threading.Thread(target=_warm_up, name='warmup', daemon=True)
+    _warmup_thread.start()
+
+
+
+
+@app.before_request
+def _start_request():
+    g.request_started = time.perf_counter()
+    # Clients can pass their own ID to find this request's match traces later
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+    current_request_id.set(g.request_id)
+
+@app.after_request
+def _observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Label by route pattern, not the raw path, so job IDs don't each become a series
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.labels(endpoint, request.method, str(response.status_code)).observe(
+            time.perf_counter() - started)
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics, summed across gunicorn workers in multiprocess mode"""
+    payload, content_type = metrics.render()
+    if payload is None:
+        return jsonify({
+            'success': False,
+            'error': 'Metrics are unavailable: prometheus_client is not installed'
+        }), 503
+    return Response(payload, content_type=content_type)
 
+@app.route('/live', methods=['GET'])
+def liveness_check():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'success': True, 'status': 'alive'})
 
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: YTMusic is initialized and authenticated"""
+    ready = services_ready['ytmusic']
+    return jsonify({
+        'success': ready,
+        'status': 'ready' if ready else 'starting',
+        'services': services_ready,
+        'startup': {'mode': STARTUP_MODE, 'timings': startup_timings}
+    }), 200 if ready else 503
 
+def _cache_tier_stats() -> Dict[str, Any]:
+    """Where this worker's lookups were answered: local cache, shared cache or upstream"""
+    with _cache_tier_lock:
+        counts = dict(cache_tier_counts)
+    total = sum(counts.values())
+    return {
+        **counts,
+        'rates': {tier: round(count / total, 4) if total else 0.0 for tier, count in counts.items()}
+    }
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -335,11 +632,265 @@ def health_check():
     return jsonify({
         'success': True,
         'status': 'healthy',
+        'ready': services_ready['ytmusic'],
+        'startup': {'mode': STARTUP_MODE, 'timings': startup_timings},
         'ytmusic_initialized': ytmusic is not None,
         'firestore_connected': db is not None,
+        'cancellations': cancellations.stats() if cancellations else None,
+        'match_cache': match_cache.stats() if match_cache else {'enabled': False},
+        'shared_match_cache': shared_cache.stats() if shared_cache else {'enabled': False},
+        'cache_tiers': _cache_tier_stats(),
+        'metrics': {'enabled': metrics.PROMETHEUS_AVAILABLE, 'multiprocess': bool(metrics.MULTIPROC_DIR)},
+        'search_flight': search_flight.stats(),
+        'rate_limiter': rate_limiter.stats() if rate_limiter else {'enabled': False},
+        'search_upstream': {**search_caller.stats(), 'circuit': search_breaker.stats()},
+        'search_fallback': {'enabled': SEARCH_FALLBACK_ENABLED, **fallback_stats},
+        'match_trace': match_tracer.stats(),
+        'client_pool': client_pool.stats() if client_pool else None,
+        'token': token_manager.stats() if token_manager else None,
+        'jobs': {
+            'active': job_runner.active_count(),
+            'max_concurrent': JOBS_MAX_CONCURRENT,
+            'progress_writes': progress_writer.stats() if progress_writer else None
+        },
         'timestamp': datetime.now().isoformat()
     })
 
+def format_match(best_match: Dict) -> Dict[str, Any]:
+    """Shape a YTMusic search result into the /search response format"""
+    return {
+        'videoId': best_match.get('videoId'),
+        'title': best_match.get('title'),
+        'artists': best_match.get('artists', []),
+        'duration': best_match.get('duration')  # Duration is already a string like "4:19"
+    }
+
+def match_cache_key(title: str, artist: str, query: str = '') -> str:
+    """Cache key for a track: normalized title + artist, or the query when those are missing"""
+    if title or artist:
+        return f"{normalize_string(title)}|{normalize_string(artist)}"
+    return f"q:{normalize_string(query)}"
+
+def source_duration(item: Dict[str, Any]) -> Optional[float]:
+    """Source track length in seconds from ``durationMs`` or ``duration`` (seconds or "m:ss")"""
+    duration_ms = item.get('durationMs')
+    if isinstance(duration_ms, (int, float)):
+        return parse_duration(duration_ms / 1000)
+    return parse_duration(item.get('duration'))
+
+def _count_cache_tier(tier: str) -> None:
+    with _cache_tier_lock:
+        cache_tier_counts[tier] += 1
+
+def _backfill_local(cache_key: str, entry: Dict[str, Any]) -> None:
+    """Copy a shared-tier entry into the local cache for the rest of its lifetime"""
+    ttl_left = int(entry['expires_at'] - time.time())
+    if match_cache and ttl_left > 0:
+        match_cache.set(cache_key, entry['result'], entry['message'], ttl=ttl_left)
+
+def _item_cache_key(item: Any) -> Optional[str]:
+    if not isinstance(item, dict):
+        return None
+    title = str(item.get('title') or '').strip()
+    artist = str(item.get('artist') or '').strip()
+    query = str(item.get('query') or '').strip()
+    if not (title or artist or query):
+        return None
+    return match_cache_key(title, artist, query)
+
+def prefetch_matches(items: List[Any]) -> int:
+    """Warm the local cache for a whole track list with one bulk shared-cache read.
+
+    Call before fanning out searches; returns how many tracks were found.
+    """
+    if not shared_cache or not ensure_firestore():
+        return 0
+    keys = [key for key in dict.fromkeys(_item_cache_key(item) for item in items) if key]
+    if match_cache:
+        fresh = match_cache.fresh_keys(keys)
+        keys = [key for key in keys if key not in fresh]
+    if not keys:
+        return 0
+    
+    started = time.time()
+    entries = shared_cache.get_many(keys)
+    if len(_prefetched) > PREFETCH_MEMO_MAX:
+        _prefetched.clear()
+    for key in keys:
+        entry = entries.get(key)
+        if entry:
+            _backfill_local(key, entry)
+        _prefetched[key] = 'hit' if entry else 'miss'
+
+    logger.info(f"🌐 Prefetched {len(entries)}/{len(keys)} matches from the shared cache in {time.time() - started:.2f}s")
+    return len(entries)
+
+def search_and_match(title: str, artist: str, query: str = '', duration: Optional[float] = None) -> Dict[str, Any]:
+    """Search YouTube Music and pick the best match for a single track.
+
+    Returns a dict with ``result`` (None when nothing matched), ``message``
+    and ``cached``. Upstream errors are raised to the caller. ``duration``
+    (seconds) lets the matcher set aside results of a very different length.
+    """
+    cache_key = match_cache_key(title, artist, query)
+    prefetched = _prefetched.pop(cache_key, None)
+    if match_cache:
+        cached = match_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"💾 Cache hit for: '{title or query}'")
+            _count_cache_tier('shared' if prefetched == 'hit' else 'local')
+            metrics.CACHE_LOOKUPS.labels('local', 'hit' if cached['result'] else 'negative_hit').inc()
+            return {'result': cached['result'], 'message': cached['message'], 'cached': True}
+        metrics.CACHE_LOOKUPS.labels('local', 'miss').inc()
+    
+    # A bulk prefetch already found nothing for this key; don't read it again
+    if shared_cache and prefetched != 'miss' and ensure_firestore():
+        cached = shared_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"🌐 Shared cache hit for: '{title or query}'")
+            _count_cache_tier('shared')
+            _backfill_local(cache_key, cached)
+            return {'result': cached['result'], 'message': cached['message'], 'cached': True}
+    
+    def run_search() -> Dict[str, Any]:
+        try:
+            outcome = _search_and_match_upstream(title, artist, query, duration)
+        except Exception:
+            metrics.MATCH_OUTCOMES.labels('error').inc()
+            raise
+        _count_cache_tier('upstream')
+        if outcome['result'] is None:
+            metrics.MATCH_OUTCOMES.labels('unmatched').inc()
+        else:
+            metrics.MATCH_OUTCOMES.labels('fallback' if 'fallback' in outcome['message'] else 'matched').inc()
+        if outcome.get('transient'):
+            return outcome
+        # Every fallback already failed: don't spend upstream calls on this track again soon
+        ttl = SEARCH_FALLBACK_NEGATIVE_TTL if outcome.get('exhausted') else None
+        if match_cache:
+            match_cache.set(cache_key, outcome['result'], outcome['message'], ttl=ttl)
+        if shared_cache:
+            shared_cache.set(cache_key, outcome['result'], outcome['message'], ttl=ttl)
+        return outcome
+    
+    # Identical concurrent searches share one upstream call
+    outcome, shared = search_flight.do(cache_key, run_search)
+    if shared:
+        logger.info(f"🔗 Coalesced with in-flight search for: '{title or query}'")
+    
+    # transient: no match, but only because some queries failed (not cached either)
+    return {'result': outcome['result'], 'message': outcome['message'], 'cached': False,
+            'transient': bool(outcome.get('transient'))}
+
+def _search_fallbacks(title: str, artist: str, duration: Optional[float] = None) -> Tuple[Optional[Dict], Optional[str], bool]:
+    """Search fallback query variants concurrently; the first acceptable match wins.
+
+    Returns ``(match, variant_label, exhausted)``. ``exhausted`` is True
+    only when every variant ran without error and found nothing, so
+    transient upstream failures are never memoized as "no match".
+    """
+    variants = fallback_queries(title, artist)
+    if not variants:
+        return None, None, True
+    
+    won = threading.Event()
+    
+    def run_variant(label: str, variant_query: str, match_title: str) -> Optional[Dict]:
+        if won.is_set():
+            return None
+        results = upstream_search(variant_query, limit=SEARCH_RESULT_LIMIT)
+        if won.is_set() or not results:
+            return None
+        match = match_results(match_title, artist, results, duration, SEARCH_INITIAL_CANDIDATES, f'fallback:{label}')
+        if match and artist_similarity(artist, match) < SEARCH_FALLBACK_MIN_ARTIST:
+            # Title-only searches in particular find same-named songs by other artists
+            logger.info(f"↩️ Fallback '{label}' match '{match.get('title')}' rejected: artist too different")
+            return None
+        return match
+    
+    with _fallback_stats_lock:
+        fallback_stats['attempts'] += 1
+    
+    logger.info(f"🪂 Trying {len(variants)} fallback queries for: '{title}' by '{artist}'")
+    futures = {submit_in_context(fallback_executor, run_variant, *variant): variant[0] for variant in variants}
+    errors = 0
+    try:
+        for future in as_completed(futures):
+            try:
+                match = future.result()
+            except Exception as e:
+                errors += 1
+                logger.warning(f"⚠️ Fallback query '{futures[future]}' failed: {str(e)}")
+                continue
+            if match:
+                won.set()
+                label = futures[future]
+                with _fallback_stats_lock:
+                    fallback_stats['wins'][label] = fallback_stats['wins'].get(label, 0) + 1
+                return match, label, False
+    finally:
+        # First good result wins: drop variants that haven't started
+        for future in futures:
+            future.cancel()
+    
+    with _fallback_stats_lock:
+        if errors:
+            fallback_stats['errors'] += 1
+        else:
+            fallback_stats['exhausted'] += 1
+    return None, None, errors == 0
+
+def _search_and_match_upstream(title: str, artist: str, query: str = '', duration: Optional[float] = None) -> Dict[str, Any]:
+    """Run the YouTube Music search and best-match scoring without the cache"""
+    search_query = query if query else f"{title} {artist}"
+    
+    logger.info(f"🔍 Searching: '{search_query}'")
+    
+    search_results = upstream_search(search_query, limit=SEARCH_RESULT_LIMIT)
+    
+    best_match = None
+    if search_results:
+        best_match = match_results(title, artist, search_results, duration, SEARCH_INITIAL_CANDIDATES)
+    
+    if not best_match and SEARCH_WIDEN_LIMIT > SEARCH_RESULT_LIMIT and len(search_results) >= SEARCH_RESULT_LIMIT:
+        logger.info(f"🔭 Widening search to {SEARCH_WIDEN_LIMIT} results for: '{search_query}'")
+        wider_results = upstream_search(search_query, limit=SEARCH_WIDEN_LIMIT)
+        seen = {r.get('videoId') for r in search_results}
+        best_match = match_results(title, artist, [r for r in wider_results if r.get('videoId') not in seen], duration,
+                                   label='widen')
+    
+    message = 'Track found successfully'
+    if not best_match and title and SEARCH_FALLBACK_ENABLED:
+        best_match, label, exhausted = _search_fallbacks(title, artist, duration)
+        if best_match:
+            message = f'Track found successfully (fallback: {label})'
+        elif exhausted:
+            logger.info(f"❌ No match for '{search_query}' after all fallback queries")
+            return {'result': None, 'message': 'No suitable match found', 'exhausted': True}
+        else:
+            # Some fallback queries errored: a retry may still find the track, so don't cache this
+            logger.info(f"❌ No match for '{search_query}' yet, some fallback queries failed")
+            return {'result': None, 'message': 'No suitable match found', 'transient': True}
+    
+    if not search_results and not best_match:
+        logger.info(f"❌ No results found for: '{search_query}'")
+        return {'result': None, 'message': 'No results found'}
+    
+    if not best_match:
+        logger.info(f"❌ No suitable match found for: '{search_query}'")
+        return {'result': None, 'message': 'No suitable match found'}
+    
+    logger.debug(f"🔍 best_match type: {type(best_match)}, value: {best_match}")
+    
+    if not isinstance(best_match, dict):
+        logger.error(f"❌ best_match is not a dict: {type(best_match)} - {best_match}")
+        raise ValueError('Invalid search result format')
+    
+    result = format_match(best_match)
+    logger.info(f"✅ Found match: {result['title']} by {[a.get('name') if isinstance(a, dict) else str(a) for a in result['artists']]}")
+    
+    return {'result': result, 'message': message}
+
 @app.route('/search', methods=['POST'])
 def search_track():
     """Search for a track on YouTube Music"""
@@ -351,74 +902,378 @@ def search_track():
         query = data.get('query', '').strip()
         title = data.get('title', '').strip()
         artist = data.get('artist', '').strip()
+        conversion_id = (data.get('conversionId') or '').strip()
         
         if not query and not (title and artist):
             return jsonify({'success': False, 'error': 'Query or title+artist required'}), 400
         
-        if not ytmusic:
+        if is_conversion_cancelled(conversion_id):
+            logger.info(f"🛑 Conversion {conversion_id} was cancelled, skipping search")
+            return jsonify({
+                'success': False,
+                'error': 'Conversion was cancelled',
+                'cancelled': True
+            }), 409
+        
+        if not ensure_ytmusic():
             return jsonify({'success': False, 'error': 'YTMusic not initialized'}), 500
         
-
-        search_query = query if query else f"{title} {artist}"
+        try:
+            outcome = search_and_match(title, artist, query, source_duration(data))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 500
+        except CircuitOpenError as e:
+            return jsonify({'success': False, 'error': str(e), 'degraded': True}), 503
         
-        logger.info(f"🔍 Searching: '{search_query}'")
+        return jsonify({
+            'success': True,
+            'result': outcome['result'],
+            'message': outcome['message'],
+            'cached': outcome['cached']
+        })
         
+    except Exception as e:
+        logger.error(f"❌ Search error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Search failed: {str(e)}'
+        }), 500
 
-        search_results = ytmusic.search(search_query, filter='songs', limit=10)
-        
-        if not search_results:
-            logger.info(f"❌ No results found for: '{search_query}'")
-            return jsonify({
-                'success': True,
-                'result': None,
-                'message': 'No results found'
-            })
-        
+@app.route('/explain-match', methods=['GET'])
+def explain_match():
+    """Per-candidate scores behind recent matches, by request ID or by track.
+
+    Traces come from this worker's ring buffer. With ``rerun=true`` (and a
+    title/artist or query) the search is run again with every result scored
+    and traced, without touching the caches.
+    """
+    request_id = request.args.get('requestId', '').strip()
+    title = request.args.get('title', '').strip()
+    artist = request.args.get('artist', '').strip()
+    query = request.args.get('query', '').strip()
+    rerun = request.args.get('rerun', 'false').lower() == 'true'
+    try:
+        limit = max(1, min(int(request.args.get('limit', '20')), MATCH_TRACE_CAPACITY or 20))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+
+    if not (request_id or title or artist or query):
+        return jsonify({'success': False, 'error': 'requestId, title, artist or query required'}), 400
+
+    cached = None
+    if match_cache and (title or artist or query):
+        cached = match_cache.get(match_cache_key(title, artist, query))
+
+    rerun_trace = None
+    if rerun:
+        if not (query or (title and artist)):
+            return jsonify({'success': False, 'error': 'Query or title+artist required to rerun'}), 400
+        if not ensure_ytmusic():
+            return jsonify({'success': False, 'error': 'YTMusic not initialized'}), 500
+        try:
+            results = upstream_search(query or f"{title} {artist}", limit=SEARCH_RESULT_LIMIT)
+        except CircuitOpenError as e:
+            return jsonify({'success': False, 'error': str(e), 'degraded': True}), 503
+        except Exception as e:
+            logger.error(f"❌ Explain-match search error: {str(e)}")
+            return jsonify({'success': False, 'error': f'Search failed: {str(e)}'}), 500
+        match_results(title, artist, results, source_duration(request.args), label='explain', force_trace=True)
+        rerun_trace = match_tracer.find(request_id=g.request_id, limit=1)[0]
+
+    traces = match_tracer.find(request_id or None, title, artist, query, limit)
+    if rerun_trace:
+        traces = [t for t in traces if t['requestId'] != g.request_id]
+    if not (traces or rerun_trace or cached):
+        return jsonify({
+            'success': False,
+            'error': 'No match traces found on this worker; pass rerun=true to score the search again',
+            'worker': os.getpid()
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'worker': os.getpid(),
+        'cached': cached,
+        'rerun': rerun_trace,
+        'traces': traces
+    })
+
+def _search_batch_item(index: int, item: Any, conversion_id: str = '') -> Dict[str, Any]:
+    """Resolve one batch item, capturing errors instead of raising"""
+    if not isinstance(item, dict):
+        return {'index': index, 'success': False, 'error': 'Item must be an object'}
+    
+    query = str(item.get('query') or '').strip()
+    title = str(item.get('title') or '').strip()
+    artist = str(item.get('artist') or '').strip()
+    
+    if not query and not (title and artist):
+        return {'index': index, 'success': False, 'error': 'Query or title+artist required'}
+    
+    if is_conversion_cancelled(conversion_id):
+        return {'index': index, 'success': False, 'error': 'Conversion was cancelled', 'cancelled': True}
+    
+    started = time.time()
+    try:
+        outcome = search_and_match(title, artist, query, source_duration(item))
+        return {
+            'index': index,
+            'success': True,
+            'result': outcome['result'],
+            'message': outcome['message'],
+            'cached': outcome['cached'],
+            'transient': outcome.get('transient', False),
+            'elapsed': round(time.time() - started, 3)
+        }
+    except Exception as e:
+        logger.error(f"❌ Batch item {index} search error: {str(e)}")
+        return {
+            'index': index,
+            'success': False,
+            'error': f'Search failed: {str(e)}',
+            'elapsed': round(time.time() - started, 3)
+        }
 
-        best_match = find_best_match(title, artist, search_results)
+def _validate_batch_items(data: Any, max_items: int) -> Optional[str]:
+    """Return an error message if the request body isn't a usable item list"""
+    if not data:
+        return 'No JSON data provided'
+    
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return 'items must be a non-empty list'
+    
+    if len(items) > max_items:
+        return f'Too many items: {len(items)} (max {max_items})'
+    
+    return None
+
+@app.route('/search-batch', methods=['POST'])
+def search_batch():
+    """Search for many tracks at once on a bounded worker pool"""
+    try:
+        data = request.get_json()
+        error = _validate_batch_items(data, SEARCH_BATCH_MAX_ITEMS)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
         
-        if not best_match:
-            logger.info(f"❌ No suitable match found for: '{search_query}'")
-            return jsonify({
-                'success': True,
-                'result': None,
-                'message': 'No suitable match found'
-            })
+        items = data['items']
+        conversion_id = str(data.get('conversionId') or '').strip()
         
-
-        logger.debug(f"🔍 best_match type: {type(best_match)}, value: {best_match}")
+        if not ensure_ytmusic():
+            return jsonify({'success': False, 'error': 'YTMusic not initialized'}), 500
         
-
-        if not isinstance(best_match, dict):
-            logger.error(f"❌ best_match is not a dict: {type(best_match)} - {best_match}")
-            return jsonify({
-                'success': False,
-                'error': 'Invalid search result format'
-            }), 500
+        logger.info(f"📦 Batch search for {len(items)} tracks ({SEARCH_BATCH_MAX_WORKERS} workers)")
+        started = time.time()
+        prefetch_matches(items)
         
-
-        result = {
-            'videoId': best_match.get('videoId'),
-            'title': best_match.get('title'),
-            'artists': best_match.get('artists', []),
-            'duration': best_match.get('duration')  # Duration is already a string like "4:19"
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        futures = {
+            submit_in_context(search_executor, _search_batch_item, i, item, conversion_id): i
+            for i, item in enumerate(items)
         }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
         
-        logger.info(f"✅ Found match: {result['title']} by {[a.get('name') if isinstance(a, dict) else str(a) for a in result['artists']]}")
+        matched = sum(1 for r in results if r and r.get('result'))
+        failed = sum(1 for r in results if r and not r.get('success'))
+        elapsed = time.time() - started
+        
+        logger.info(f"✅ Batch search done: {matched}/{len(items)} matched, {failed} errors in {elapsed:.2f}s")
         
         return jsonify({
             'success': True,
-            'result': result,
-            'message': 'Track found successfully'
+            'results': results,
+            'matched': matched,
+            'failed': failed,
+            'total': len(items),
+            'cancelled': is_conversion_cancelled(conversion_id),
+            'elapsed': round(elapsed, 3)
         })
         
     except Exception as e:
-        logger.error(f"❌ Search error: {str(e)}")
+        logger.error(f"❌ Batch search error: {str(e)}")
         return jsonify({
             'success': False,
-            'error': f'Search failed: {str(e)}'
+            'error': f'Batch search failed: {str(e)}'
+        }), 500
+
+def _iter_stream_results(items: List[Any], conversion_id: str = ''):
+    """Yield batch item results as they complete, keeping a bounded number in flight.
+
+    Stops submitting new items once the conversion is cancelled.
+    """
+    window = SEARCH_BATCH_MAX_WORKERS * 2
+    pending = set()
+    next_index = 0
+    
+    try:
+        while next_index < len(items) or pending:
+            if is_conversion_cancelled(conversion_id):
+                next_index = len(items)
+            while next_index < len(items) and len(pending) < window:
+                pending.add(submit_in_context(search_executor, _search_batch_item, next_index, items[next_index], conversion_id))
+                next_index += 1
+            if not pending:
+                break
+            
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # Client went away: don't keep searching for nobody
+        for future in pending:
+            future.cancel()
+
+def _on_sync_worker() -> bool:
+    """Whether this request is served by a gunicorn sync worker (see gunicorn.conf.py)"""
+    return (request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn')
+            and os.getenv('GUNICORN_WORKER_CLASS', 'sync') == 'sync')
+
+@app.route('/search-stream', methods=['POST'])
+def search_stream():
+    """Stream match results for a track list as they finish (NDJSON or SSE)"""
+    try:
+        data = request.get_json()
+        error = _validate_batch_items(data, SEARCH_STREAM_MAX_ITEMS)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
+        if _on_sync_worker() and len(data['items']) > SEARCH_STREAM_SYNC_MAX_ITEMS:
+            return jsonify({
+                'success': False,
+                'error': f"Too many items for a sync worker: {len(data['items'])} (max {SEARCH_STREAM_SYNC_MAX_ITEMS}); "
+                         f"split the list, use /jobs, or run gunicorn with GUNICORN_WORKER_CLASS=gthread or gevent"
+            }), 400
+        
+        if not ensure_ytmusic():
+            return jsonify({'success': False, 'error': 'YTMusic not initialized'}), 500
+        
+        items = data['items']
+        conversion_id = str(data.get('conversionId') or '').strip()
+        use_sse = (
+            request.args.get('format') == 'sse'
+            or 'text/event-stream' in request.headers.get('Accept', '')
+        )
+        
+        logger.info(f"📡 Streaming search for {len(items)} tracks ({'sse' if use_sse else 'ndjson'})")
+        
+        def encode(payload: Dict[str, Any], event: str = 'result') -> str:
+            line = json.dumps(payload)
+            if use_sse:
+                return f"event: {event}\ndata: {line}\n\n"
+            return line + "\n"
+        
+        # The body is produced after the view returns, so time the request until the stream ends
+        # (or the client disconnects) here instead of in _observe_request
+        request_started = g.pop('request_started', time.perf_counter())
+        endpoint = request.url_rule.rule
+        
+        def generate():
+            started = time.time()
+            matched = 0
+            failed = 0
+            try:
+                prefetch_matches(items)
+                
+                for item_result in _iter_stream_results(items, conversion_id):
+                    if item_result.get('result'):
+                        matched += 1
+                    if not item_result.get('success'):
+                        failed += 1
+                    yield encode(item_result)
+                
+                elapsed = time.time() - started
+                logger.info(f"✅ Streaming search done: {matched}/{len(items)} matched, {failed} errors in {elapsed:.2f}s")
+                yield encode({
+                    'done': True,
+                    'matched': matched,
+                    'failed': failed,
+                    'total': len(items),
+                    'cancelled': is_conversion_cancelled(conversion_id),
+                    'elapsed': round(elapsed, 3)
+                }, event='done')
+            finally:
+                metrics.HTTP_REQUEST_SECONDS.labels(endpoint, 'POST', '200').observe(
+                    time.perf_counter() - request_started)
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    except Exception as e:
+        logger.error(f"❌ Streaming search error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Streaming search failed: {str(e)}'
         }), 500
 
+def playlist_checkpoints():
+    """Checkpoint store for chunked builds: Firestore when connected, local files otherwise"""
+    global _file_checkpoints
+    if db:
+        return FirestoreCheckpointStore(db, PLAYLIST_CHECKPOINT_TTL)
+    if _file_checkpoints is None:
+        _file_checkpoints = FileCheckpointStore(PLAYLIST_CHECKPOINT_DIR, PLAYLIST_CHECKPOINT_TTL)
+    return _file_checkpoints
+
+def create_playlist(title: str, description: str, video_ids: List[str], conversion_id: str = '',
+                    chunked: Optional[bool] = None, chunk_size: Optional[int] = None,
+                    build_key: str = '') -> Dict[str, Any]:
+    """Create an UNLISTED playlist with tracks, raising on any upstream error.
+
+    Lists longer than PLAYLIST_CHUNK_THRESHOLD (or ``chunked=True``) are
+    built in chunks. With a conversion ID or ``build_key`` each chunk is
+    checkpointed, and repeating the call with the same key and tracks
+    resumes a partial build; without one, every call creates a new playlist.
+    """
+    if chunked is None:
+        chunked = len(video_ids) > PLAYLIST_CHUNK_THRESHOLD
+    
+    mode = 'chunked' if chunked and video_ids else 'single'
+    with metrics.timer(metrics.CREATE_PLAYLIST_SECONDS, mode=mode):
+        if chunked and video_ids:
+            build_key = conversion_id or build_key
+            builder = PlaylistBuilder(
+                call_ytmusic,
+                playlist_checkpoints() if build_key else None,
+                chunk_size=chunk_size or PLAYLIST_CHUNK_SIZE,
+                chunk_retries=PLAYLIST_CHUNK_RETRIES
+            )
+            result = builder.build(
+                build_key, title, description, video_ids,
+                should_stop=lambda: is_conversion_cancelled(conversion_id)
+            )
+            logger.info(f"✅ Playlist {result['playlistId']}: {result['tracksAdded']} added, "
+                        f"{result['tracksSkipped']} skipped, {result['tracksFailed']} failed in {result['chunks']} chunks")
+            return result
+    
+        logger.info(f"📝 Creating UNLISTED YouTube Music playlist with {len(video_ids)} tracks: '{title}'")
+    
+        builder = PlaylistBuilder(call_ytmusic, None, chunk_size=max(1, len(video_ids)),
+                                  chunk_retries=PLAYLIST_CHUNK_RETRIES)
+        playlist_id = builder.create(title, description)
+        logger.info(f"📋 Created playlist ID: '{playlist_id}'")
+    
+        # Added in one call rather than passed to create_playlist, whose response
+        # doesn't say how many tracks YouTube Music actually accepted
+        added = builder.add_items(playlist_id, video_ids) if video_ids else {'added': 0, 'skipped': 0, 'failedVideoIds': []}
+        logger.info(f"✅ Playlist {playlist_id}: {added['added']} added, {added['skipped']} skipped, "
+                    f"{len(added['failedVideoIds'])} failed")
+    
+        return {
+            'playlistId': playlist_id,
+            'title': title,
+            'description': description,
+            'url': f"https://music.youtube.com/playlist?list={playlist_id}",
+            'tracksAdded': added['added'],
+            'tracksSkipped': added['skipped'],
+            'tracksFailed': len(added['failedVideoIds']),
+            'failedVideoIds': added['failedVideoIds']
+        }
+
 @app.route('/create-playlist-with-tracks', methods=['POST'])
 def create_playlist_with_tracks():
     """Create a new playlist on YouTube Music with tracks"""
@@ -442,77 +1297,338 @@ def create_playlist_with_tracks():
             return jsonify({'success': False, 'error': 'Playlist title is required'}), 400
 
         # Check for cancellation
-        if conversion_id and db:
-            try:
-                conversion_doc = db.collection('conversion-jobs').document(conversion_id).get()
-                if conversion_doc.exists:
-                    conversion_data = conversion_doc.to_dict()
-                    if conversion_data.get('status') == 'cancelled':
-                        logger.info(f"🛑 Conversion {conversion_id} was cancelled, aborting playlist creation")
-                        return jsonify({
-                            'success': False, 
-                            'error': 'Conversion was cancelled',
-                            'cancelled': True
-                        }), 409
-            except Exception as e:
-                logger.warning(f"⚠️ Could not check conversion status for {conversion_id}: {str(e)}")
+        if is_conversion_cancelled(conversion_id):
+            logger.info(f"🛑 Conversion {conversion_id} was cancelled, aborting playlist creation")
+            return jsonify({
+                'success': False, 
+                'error': 'Conversion was cancelled',
+                'cancelled': True
+            }), 409
 
-        if not ytmusic:
+        if not ensure_ytmusic():
             logger.error("❌ YTMusic instance is not initialized")
             return jsonify({'success': False, 'error': 'YTMusic not initialized'}), 500
         
-        logger.info(f"📝 Creating UNLISTED YouTube Music playlist with {len(video_ids)} tracks: '{title}'")
+        chunk_size = data.get('chunkSize')
+        if chunk_size is not None and (not isinstance(chunk_size, int) or chunk_size < 1):
+            return jsonify({'success': False, 'error': 'chunkSize must be a positive integer'}), 400
         
-        # Create playlist with all tracks at once
-        playlist_result = ytmusic.create_playlist(
-            title, 
-            description, 
-            privacy_status='UNLISTED',
-            video_ids=video_ids if video_ids else None
+        result = create_playlist(
+            title,
+            description,
+            video_ids,
+            conversion_id=conversion_id,
+            chunked=data.get('chunked'),
+            chunk_size=chunk_size,
+            build_key=str(data.get('buildKey') or '').strip()
         )
         
-        logger.info(f"✅ UNLISTED playlist with tracks creation successful")
-        logger.info(f"📊 Playlist result: {playlist_result}")
+        logger.info(f"✅ Successfully created playlist with tracks: {result['playlistId']}")
+        
+        return jsonify({
+            'success': True,
+            'playlist': result,
+            'message': f"Playlist created successfully with {result['tracksAdded']} tracks"
+        })
+        
+    except BuildCancelled:
+        logger.info(f"🛑 Conversion {conversion_id} was cancelled, playlist build paused")
+        return jsonify({
+            'success': False,
+            'error': 'Conversion was cancelled',
+            'cancelled': True
+        }), 409
+    except Exception as e:
+        logger.error(f"❌ Playlist creation error: {str(e)}")
+        import traceback
+        logger.error(f"❌ Full traceback: {traceback.format_exc()}")
+        return jsonify({
+            'success': False,
+            'error': f'Playlist creation failed: {str(e)}'
+        }), 500
+
+job_runner = JobRunner(
+    search_fn=search_and_match,
+    create_playlist_fn=create_playlist,
+    is_cancelled=is_conversion_cancelled,
+    prefetch_fn=prefetch_matches,
+    search_executor=search_executor,
+    search_window=SEARCH_BATCH_MAX_WORKERS * 2,
+    progress=None,
+    max_jobs=JOBS_MAX_CONCURRENT,
+    retention=JOBS_RETENTION
+)
 
-        if isinstance(playlist_result, dict):
-            logger.error(f"❌ Playlist creation returned dict (error): {playlist_result}")
+def _validate_job_tracks(tracks: Any) -> Optional[str]:
+    if not isinstance(tracks, list) or not tracks:
+        return 'tracks must be a non-empty list'
+    if len(tracks) > JOBS_MAX_TRACKS:
+        return f'At most {JOBS_MAX_TRACKS} tracks per job'
+    for index, track in enumerate(tracks):
+        if not isinstance(track, dict) or not (str(track.get('title') or '').strip() or str(track.get('artist') or '').strip()):
+            return f'Track {index} needs a title or artist'
+    return None
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a full conversion (search, match, create playlist) and return its job ID"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'success': False, 'error': 'No JSON data provided'}), 400
+        
+        title = str(data.get('title') or '').strip()
+        description = str(data.get('description') or '').strip()
+        conversion_id = str(data.get('conversionId') or '').strip()
+        tracks = data.get('tracks')
+        
+        if not title:
+            return jsonify({'success': False, 'error': 'Playlist title is required'}), 400
+        error = _validate_job_tracks(tracks)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
+        if is_conversion_cancelled(conversion_id):
+            return jsonify({'success': False, 'error': 'Conversion was cancelled', 'cancelled': True}), 409
+        
+        if not ensure_ytmusic():
+            return jsonify({'success': False, 'error': 'YTMusic not initialized'}), 500
+        
+        active = job_runner.active_count()
+        if active >= JOBS_MAX_QUEUED:
             return jsonify({
-                'success': False, 
-                'error': f'Playlist creation returned error: {playlist_result}'
-            }), 500
+                'success': False,
+                'error': f'Server is busy processing {active} conversions. Please try again in a few minutes.'
+            }), 429
         
-        playlist_id = str(playlist_result).strip()
-        logger.info(f"📋 Created playlist ID: '{playlist_id}' with {len(video_ids)} tracks")
+        try:
+            job = job_runner.submit(
+                [{
+                    'title': str(t.get('title') or '').strip(),
+                    'artist': str(t.get('artist') or '').strip(),
+                    'spotifyUrl': t.get('spotifyUrl', ''),
+                    'duration': source_duration(t)
+                } for t in tracks],
+                title,
+                description,
+                source_url=data.get('spotifyPlaylistUrl', ''),
+                job_id=conversion_id or None
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 409
+        
+        return jsonify({'success': True, 'jobId': job.id, 'status': job.status}), 202
+        
+    except Exception as e:
+        logger.error(f"❌ Job creation error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Job creation failed: {str(e)}'
+        }), 500
+
+def _read_job_document(job_id: str) -> Optional[Dict[str, Any]]:
+    """Job state from Firestore, for jobs owned by another worker or already pruned"""
+    if not ensure_firestore() or not db:
+        return None
+    with metrics.timer(metrics.FIRESTORE_READ_SECONDS, operation='job_get'):
+        doc = db.collection('conversion-jobs').document(job_id).get()
+    if not doc.exists:
+        return None
+    data = doc.to_dict()
+    return {
+        'jobId': job_id,
+        'status': data.get('status'),
+        'progress': data.get('progress'),
+        'result': data.get('result')
+    }
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status of a conversion job"""
+    try:
+        job = job_runner.get(job_id)
+        if job:
+            return jsonify({'success': True, 'job': job.summary(), 'source': 'memory'})
+        
+        document = _read_job_document(job_id)
+        if document:
+            return jsonify({'success': True, 'job': document, 'source': 'firestore'})
+        
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+        
+    except Exception as e:
+        logger.error(f"❌ Job lookup error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Job lookup failed: {str(e)}'
+        }), 500
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a conversion job"""
+    try:
+        if job_runner.cancel(job_id):
+            if cancellations:
+                cancellations.mark_cancelled(job_id)
+            # The job reports 'cancelled' itself once it notices
+            return jsonify({'success': True, 'message': 'Conversion cancelled successfully'})
+        
+        if job_runner.get(job_id):
+            return jsonify({'success': False, 'error': 'Job already finished'}), 409
+        
+        # Owned by another worker: its cancellation registry picks this up
+        if not ensure_firestore() or not db:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        ref = db.collection('conversion-jobs').document(job_id)
+        with metrics.timer(metrics.FIRESTORE_READ_SECONDS, operation='job_get'):
+            doc = ref.get()
+        if not doc.exists:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        if (doc.to_dict() or {}).get('status') in ('completed', 'failed', 'cancelled'):
+            return jsonify({'success': False, 'error': 'Job already finished'}), 409
+        ref.set({
+            'status': 'cancelled',
+            'progress': 0,
+            'updatedAt': datetime.now(timezone.utc),
+            'result': {
+                'error': 'Conversion cancelled by user',
+                'cancelledAt': datetime.now().isoformat()
+            }
+        }, merge=['status', 'progress', 'updatedAt', 'result'])
+        if cancellations:
+            cancellations.mark_cancelled(job_id)
+        return jsonify({'success': True, 'message': 'Conversion cancelled successfully'})
+        
+    except Exception as e:
+        logger.error(f"❌ Job cancel error: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': f'Job cancel failed: {str(e)}'
+        }), 500
+
+def _cached_video_id(track: Dict[str, Any]) -> Optional[str]:
+    """videoId of the cached match for a source track, without searching"""
+    if not match_cache:
+        return None
+    cached = match_cache.get(match_cache_key(track.get('title', ''), track.get('artist', '')))
+    if cached and cached['result']:
+        return cached['result'].get('videoId')
+    return None
+
+@app.route('/sync-playlist', methods=['POST'])
+def sync_playlist():
+    """Bring an existing playlist in line with the current source tracks, searching only new ones"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'success': False, 'error': 'No JSON data provided'}), 400
+        
+        playlist_id = str(data.get('playlistId') or '').strip()
+        conversion_id = str(data.get('conversionId') or '').strip()
+        tracks = data.get('tracks')
+        remove_missing = data.get('removeMissing', True) is not False
+        dry_run = data.get('dryRun', False) is True
         
         if not playlist_id:
-            logger.error("❌ Playlist ID is empty after creation")
-            return jsonify({'success': False, 'error': 'Failed to create playlist - empty ID returned'}), 500
+            return jsonify({'success': False, 'error': 'playlistId is required'}), 400
+        error = _validate_job_tracks(tracks)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        if len(tracks) > SYNC_MAX_TRACKS:
+            return jsonify({'success': False, 'error': f'At most {SYNC_MAX_TRACKS} tracks per sync'}), 400
         
-        playlist_url = f"https://music.youtube.com/playlist?list={playlist_id}"
+        if is_conversion_cancelled(conversion_id):
+            return jsonify({'success': False, 'error': 'Conversion was cancelled', 'cancelled': True}), 409
         
-        result = {
-            'playlistId': playlist_id,
-            'title': title,
-            'description': description,
-            'url': playlist_url,
-            'tracksAdded': len(video_ids)
-        }
+        if not ensure_ytmusic():
+            return jsonify({'success': False, 'error': 'YTMusic not initialized'}), 500
+        
+        started = time.time()
+        tracks = [{
+            'title': str(t.get('title') or '').strip(),
+            'artist': str(t.get('artist') or '').strip()
+        } for t in tracks]
+        prefetch_matches(tracks)
+        
+        playlist = call_ytmusic('get_playlist', playlist_id, limit=None)
+        target_tracks = playlist.get('tracks') or []
+        
+        plan = plan_sync(
+            tracks, target_tracks, _cached_video_id,
+            SYNC_LOCAL_MATCH_THRESHOLD, SYNC_LOCAL_MIN_ARTIST, SYNC_MAX_FUZZY_PAIRS
+        )
+        logger.info(f"🔄 Sync {playlist_id}: {len(plan.kept)}/{len(tracks)} tracks already present "
+                    f"({plan.resolved_by}), {len(plan.unresolved)} to search")
+        
+        statuses: List[Optional[Dict[str, Any]]] = [None] * len(tracks)
+        for index, kept in plan.kept.items():
+            statuses[index] = {'index': index, 'status': 'kept', 'videoId': kept['videoId']}
+        
+        upstream_searches = 0
+        futures = [submit_in_context(search_executor, _search_batch_item, index, tracks[index], conversion_id) for index in plan.unresolved]
+        for future in futures:
+            item = future.result()
+            if item['success'] and not item.get('cached'):
+                upstream_searches += 1
+            statuses[item['index']] = plan.record_search(item['index'], item)
+        
+        to_add = plan.to_add
+        add_ids = list(dict.fromkeys(video_id for _, video_id in to_add))
+        to_remove = plan.removals() if remove_missing else []
+        removals_skipped = remove_missing and bool(plan.failed)
+        if removals_skipped:
+            logger.warning(f"⚠️ Sync {playlist_id}: {len(plan.failed)} searches failed, not removing any tracks")
+        
+        if is_conversion_cancelled(conversion_id):
+            return jsonify({'success': False, 'error': 'Conversion was cancelled', 'cancelled': True}), 409
         
-        logger.info(f"✅ Successfully created playlist with tracks: {playlist_id}")
+        add_outcome = {'added': 0, 'skipped': 0, 'failedVideoIds': []}
+        remove_outcome = {'removed': 0, 'failedVideoIds': []}
+        if not dry_run:
+            builder = PlaylistBuilder(call_ytmusic, None, chunk_size=PLAYLIST_CHUNK_SIZE, chunk_retries=PLAYLIST_CHUNK_RETRIES)
+            if add_ids:
+                add_outcome = builder.add_items(playlist_id, add_ids)
+            if to_remove:
+                remove_outcome = builder.remove_items(playlist_id, to_remove)
+        
+        failed_adds = set(add_outcome['failedVideoIds'])
+        for index, video_id in to_add:
+            status = 'to_add' if dry_run else 'add_failed' if video_id in failed_adds else 'added'
+            statuses[index] = {'index': index, 'status': status, 'videoId': video_id}
+        
+        elapsed = time.time() - started
+        logger.info(f"✅ Sync {playlist_id} done: +{add_outcome['added']} -{remove_outcome['removed']}, "
+                    f"{upstream_searches} searches in {elapsed:.2f}s")
         
         return jsonify({
             'success': True,
-            'playlist': result,
-            'message': f'Playlist created successfully with {len(video_ids)} tracks'
+            'playlistId': playlist_id,
+            'dryRun': dry_run,
+            'kept': len(plan.kept),
+            'searched': len(plan.unresolved),
+            'upstreamSearches': upstream_searches,
+            'resolvedBy': plan.resolved_by,
+            'toAdd': len(add_ids),
+            'added': add_outcome['added'],
+            'addFailed': len(add_outcome['failedVideoIds']),
+            'toRemove': [{'videoId': t['videoId'], 'title': t.get('title')} for t in to_remove],
+            'removed': remove_outcome['removed'],
+            'removeFailed': len(remove_outcome['failedVideoIds']),
+            # Removals wait for a sync where every search succeeded
+            'removalsSkipped': removals_skipped,
+            # Unclaimed entries kept because a not-found source track may be them
+            'keptUnmatched': [{'videoId': t['videoId'], 'title': t.get('title')} for t in plan.protected],
+            'searchErrors': len(plan.failed),
+            'notFound': sum(1 for s in statuses if s and s['status'] == 'not_found'),
+            'tracks': statuses,
+            'elapsed': round(elapsed, 3)
         })
         
     except Exception as e:
-        logger.error(f"❌ Playlist creation error: {str(e)}")
-        import traceback
-        logger.error(f"❌ Full traceback: {traceback.format_exc()}")
+        logger.error(f"❌ Playlist sync error: {str(e)}")
         return jsonify({
             'success': False,
-            'error': f'Playlist creation failed: {str(e)}'
+            'error': f'Playlist sync failed: {str(e)}'
         }), 500
 
 @app.errorhandler(404)
@@ -530,19 +1646,35 @@ def internal_error(error):
     }), 500
 
 # Initialize services on startup
-logger.info("🚀 Starting YTMusic Microservice...")
+logger.info(f"🚀 Starting YTMusic Microservice ({STARTUP_MODE} startup)...")
+startup_timings['imports'] = round(time.time() - _IMPORT_STARTED, 3)
 
-firestore_ready = init_firestore()
-ytmusic_ready = init_ytmusic()
+if DEFER_WARMUP and STARTUP_MODE == 'eager':
+    # Network clients must not be created in the gunicorn master and shared by forked workers
+    logger.warning("⚠️ Preloaded app can't start eagerly, using background startup in each worker")
+    STARTUP_MODE = 'background'
 
-if not ytmusic_ready:
-    logger.error("❌ YTMusic initialization failed!")
-    exit(1)
+# Local-only setup is cheap and fork-safe, so it always runs here
+_timed('match_cache_init', init_match_cache)
+_timed('rate_limiter_init', init_rate_limiter)
 
-if not firestore_ready:
-    logger.warning("⚠️ Firestore initialization failed - continuing without Firestore")
+if STARTUP_MODE == 'eager':
+    services_ready['firestore'] = _init_firestore_and_listeners()
+    services_ready['ytmusic'] = _init_ytmusic_and_verify()
+    
+    if not services_ready['ytmusic']:
+        logger.error("❌ YTMusic initialization failed!")
+        exit(1)
+    
+    if not services_ready['firestore']:
+        logger.warning("⚠️ Firestore initialization failed - continuing without Firestore")
+    
+    startup_timings['ready_after'] = round(time.time() - _IMPORT_STARTED, 3)
+    logger.info("✅ YTMusic service initialized successfully")
+elif not DEFER_WARMUP:
+    start_warmup()
 
-logger.info("✅ YTMusic service initialized successfully")
+logger.info(f"⏱️ Startup timings (s): {startup_timings}")
 
 if __name__ == '__main__':
     # This will only run for local development
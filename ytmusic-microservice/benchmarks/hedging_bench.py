@@ -0,0 +1,115 @@
+"""Measure search tail latency with request hedging on vs. off.
+
+Replays a simulated upstream whose latency is log-normal with a small
+fraction of slow stragglers (what we see from ytmusic.search) through
+HedgedCaller, and prints p50/p95/p99 plus how many extra requests the
+hedges cost.
+
+Usage:
+    python benchmarks/hedging_bench.py [--calls N] [--concurrency N]
+        [--median-ms MS] [--straggler-rate R] [--straggler-ms MS]
+"""
+import os
+import sys
+import time
+import random
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resilience import HedgedCaller  # noqa: E402
+
+
+class SimulatedUpstream:
+    def __init__(self, median_ms: float, sigma: float, straggler_rate: float, straggler_ms: float, seed: int):
+        self.median = median_ms / 1000.0
+        self.sigma = sigma
+        self.straggler_rate = straggler_rate
+        self.straggler = straggler_ms / 1000.0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def search(self, query: str) -> List[dict]:
+        with self._lock:
+            self.requests += 1
+            straggler = self._rng.random() < self.straggler_rate
+            delay = self._rng.lognormvariate(0, self.sigma) * self.median
+        time.sleep(delay + (self.straggler if straggler else 0.0))
+        return [{'videoId': query}]
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+def run(hedge: bool, args) -> None:
+    upstream = SimulatedUpstream(args.median_ms, args.sigma, args.straggler_rate, args.straggler_ms, args.seed)
+    caller = HedgedCaller(
+        max_workers=args.concurrency * 2 + 2,
+        deadline=args.deadline,
+        hedge=hedge,
+        hedge_percentile=args.hedge_percentile,
+        min_hedge_delay=args.min_hedge_ms / 1000.0
+    )
+
+    # Warm the latency window so the hedge threshold is known from the start
+    for i in range(HedgedCaller.MIN_SAMPLES):
+        caller.call(upstream.search, f'warmup-{i}')
+    upstream.requests = 0
+
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def one(i: int) -> None:
+        started = time.perf_counter()
+        try:
+            caller.call(upstream.search, f'q-{i}')
+        except Exception:
+            pass
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.calls)))
+    wall = time.perf_counter() - started
+
+    stats = caller.stats()
+    extra = upstream.requests - args.calls
+    print(
+        f"hedging {'on ' if hedge else 'off'}: "
+        f"p50 {_percentile(latencies, 50) * 1000:7.1f}ms  "
+        f"p95 {_percentile(latencies, 95) * 1000:7.1f}ms  "
+        f"p99 {_percentile(latencies, 99) * 1000:7.1f}ms  "
+        f"wall {wall:6.2f}s  "
+        f"extra requests {extra} ({extra / args.calls:.1%}), hedge wins {stats['hedge_wins']}, "
+        f"deadlines {stats['deadlines_exceeded']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Search tail latency with hedging on vs. off')
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--median-ms', type=float, default=120)
+    parser.add_argument('--sigma', type=float, default=0.35)
+    parser.add_argument('--straggler-rate', type=float, default=0.04)
+    parser.add_argument('--straggler-ms', type=float, default=1500)
+    parser.add_argument('--deadline', type=float, default=10)
+    parser.add_argument('--hedge-percentile', type=float, default=95)
+    parser.add_argument('--min-hedge-ms', type=float, default=50)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    run(False, args)
+    run(True, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""Load-test the service under gunicorn against a fake YouTube Music and Firestore.
+
+For each worker model, starts gunicorn with gunicorn.conf.py serving
+benchmarks/loadtest_app.py (app.py with simulated upstream latency,
+errors and 429s, and an in-memory Firestore). It then drives /search
+and /create-playlist-with-tracks from ``--concurrency`` closed-loop
+clients for ``--duration`` seconds. Throughput, p50/p95/p99 latency and
+error rates are reported per worker model and endpoint.
+
+Usage:
+    python benchmarks/loadtest.py [--worker-classes sync gthread gevent] [--workers N] [--threads N]
+        [--concurrency N] [--duration S] [--playlist-ratio R] [--playlist-size N] [--repeat-ratio R]
+        [--latency-ms MS] [--error-rate R] [--throttle-rate R] [--output PATH] [--baseline PATH]
+
+The app's own settings (RATE_LIMIT_*, SEARCH_* ...) are taken from the
+environment as usual. With ``--baseline`` (an earlier ``--output`` file),
+the run exits non-zero when throughput for any worker model and endpoint
+drops by more than ``--tolerance``.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import importlib.util
+from typing import Any, Dict, List
+
+import requests
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ('/search', '/create-playlist-with-tracks')
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """gunicorn serving loadtest_app with one worker model, in its own scratch directory"""
+
+    def __init__(self, worker_class: str, args):
+        self.worker_class = worker_class
+        self.port = _free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        self.workdir = tempfile.mkdtemp(prefix=f'loadtest-{worker_class}-')
+        env = dict(os.environ)
+        env.update({
+            'GUNICORN_BIND': f'127.0.0.1:{self.port}',
+            'GUNICORN_WORKERS': str(args.workers),
+            'GUNICORN_WORKER_CLASS': worker_class,
+            'GUNICORN_THREADS': str(args.threads if worker_class == 'gthread' else 1),
+            'GUNICORN_WORKER_CONNECTIONS': str(max(100, args.concurrency * 2)),
+            'PROMETHEUS_MULTIPROC_DIR': os.path.join(self.workdir, 'metrics'),
+            'MATCH_CACHE_PATH': os.path.join(self.workdir, 'match_cache.sqlite3'),
+            'RATE_LIMIT_STATE_PATH': os.path.join(self.workdir, 'rate_limit.bin'),
+            'PLAYLIST_CHECKPOINT_DIR': os.path.join(self.workdir, 'playlist_builds'),
+            'FAKE_YTMUSIC_LATENCY_MS': str(args.latency_ms),
+            'FAKE_YTMUSIC_LATENCY_SIGMA': str(args.latency_sigma),
+            'FAKE_YTMUSIC_ERROR_RATE': str(args.error_rate),
+            'FAKE_YTMUSIC_THROTTLE_RATE': str(args.throttle_rate),
+            'FAKE_FIRESTORE_LATENCY_MS': str(args.firestore_latency_ms)
+        })
+        env.pop('YTMUSIC_OAUTH_FILE', None)
+        self.log_path = os.path.join(self.workdir, 'gunicorn.log')
+        self._log = open(self.log_path, 'w')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+             '--pythonpath', os.path.join(SERVICE_DIR, 'benchmarks'), 'loadtest_app:app'],
+            cwd=SERVICE_DIR, env=env, stdout=self._log, stderr=subprocess.STDOUT
+        )
+
+    def wait_ready(self, timeout: float) -> None:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with {self.process.returncode}, see {self.log_path}')
+            try:
+                if requests.get(f'{self.url}/ready', timeout=2).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.25)
+        raise RuntimeError(f'Service not ready after {timeout:.0f}s, see {self.log_path}')
+
+    def stop(self, keep_logs: bool) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._log.close()
+        if not keep_logs:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {endpoint: [] for endpoint in ENDPOINTS}
+        self.statuses: Dict[str, Dict[str, int]] = {endpoint: {} for endpoint in ENDPOINTS}
+
+    def add(self, endpoint: str, latency: float, status: str) -> None:
+        with self._lock:
+            self.samples[endpoint].append(latency)
+            self.statuses[endpoint][status] = self.statuses[endpoint].get(status, 0) + 1
+
+
+def drive(url: str, args, recorder: Recorder, seed: int) -> None:
+    """Closed-loop clients: each sends its next request as soon as the last one answers"""
+    stop_at = time.time() + args.warmup + args.duration
+    measure_from = time.time() + args.warmup
+    sent_titles: List[int] = []
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+
+    def client(client_id: int) -> None:
+        rng = random.Random(seed * 1000 + client_id)
+        session = requests.Session()
+        while time.time() < stop_at:
+            if rng.random() < args.playlist_ratio:
+                endpoint = '/create-playlist-with-tracks'
+                body = {
+                    'title': f'Loadtest playlist {client_id}',
+                    'videoIds': [f'lt{rng.getrandbits(40):010x}' for _ in range(args.playlist_size)]
+                }
+            else:
+                endpoint = '/search'
+                with counter_lock:
+                    if sent_titles and rng.random() < args.repeat_ratio:
+                        n = rng.choice(sent_titles)
+                    else:
+                        n = next(counter)
+                        sent_titles.append(n)
+                body = {'title': f'Loadtest Track {n}', 'artist': f'Artist {n % 97}'}
+
+            started = time.perf_counter()
+            try:
+                response = session.post(f'{url}{endpoint}', json=body, timeout=args.request_timeout)
+                status = str(response.status_code)
+            except requests.Timeout:
+                status = 'timeout'
+            except requests.RequestException:
+                status = 'connection-error'
+            if time.time() >= measure_from:
+                recorder.add(endpoint, time.perf_counter() - started, status)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def summarize(recorder: Recorder, duration: float) -> Dict[str, Dict[str, Any]]:
+    summary = {}
+    for endpoint in ENDPOINTS:
+        samples = recorder.samples[endpoint]
+        statuses = recorder.statuses[endpoint]
+        errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+        summary[endpoint] = {
+            'requests': len(samples),
+            'throughput_per_s': round(len(samples) / duration, 2),
+            'p50_ms': round(_percentile(samples, 50) * 1000, 1),
+            'p95_ms': round(_percentile(samples, 95) * 1000, 1),
+            'p99_ms': round(_percentile(samples, 99) * 1000, 1),
+            'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+            'statuses': statuses
+        }
+    return summary
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for worker_class, endpoints in results.items():
+        for endpoint, stats in endpoints.items():
+            before = baseline.get(worker_class, {}).get(endpoint)
+            if not before or not before['throughput_per_s']:
+                continue
+            if stats['throughput_per_s'] < before['throughput_per_s'] * (1 - tolerance):
+                regressions.append(f"{worker_class} {endpoint} throughput {before['throughput_per_s']}/s -> "
+                                   f"{stats['throughput_per_s']}/s")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--worker-classes', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--workers', type=int, default=int(os.getenv('GUNICORN_WORKERS', '2')))
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gthread worker')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--request-timeout', type=float, default=60)
+    parser.add_argument('--playlist-ratio', type=float, default=0.05, help='Share of requests creating playlists')
+    parser.add_argument('--playlist-size', type=int, default=50)
+    parser.add_argument('--repeat-ratio', type=float, default=0.0, help='Share of searches repeating an earlier track')
+    parser.add_argument('--latency-ms', type=float, default=150, help='Median fake upstream latency')
+    parser.add_argument('--latency-sigma', type=float, default=0.4)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--firestore-latency-ms', type=float, default=20)
+    parser.add_argument('--startup-timeout', type=float, default=60)
+    parser.add_argument('--output', help='Write the results as JSON')
+    parser.add_argument('--baseline', help='Earlier --output file to compare throughput against')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--keep-logs', action='store_true', help="Keep each server's scratch directory and log")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+
+    results: Dict[str, Any] = {}
+    for worker_class in args.worker_classes:
+        if worker_class == 'gevent' and importlib.util.find_spec('gevent') is None:
+            print("⚠️ gevent is not installed, skipping the gevent worker (pip install gevent)")
+            continue
+
+        server = Server(worker_class, args)
+        try:
+            server.wait_ready(args.startup_timeout)
+            recorder = Recorder()
+            drive(server.url, args, recorder, args.seed)
+            results[worker_class] = summarize(recorder, args.duration)
+        except RuntimeError as e:
+            print(f"❌ {worker_class}: {str(e)}")
+            server.stop(keep_logs=True)
+            continue
+        server.stop(keep_logs=args.keep_logs)
+
+        threads = f" x {args.threads} threads" if worker_class == 'gthread' else ''
+        print(f"{worker_class} ({args.workers} workers{threads}, {args.concurrency} clients, {args.duration:.0f}s):")
+        for endpoint, stats in results[worker_class].items():
+            print(f"  {endpoint:30s} {stats['requests']:6d} req  {stats['throughput_per_s']:8.1f}/s  "
+                  f"p50 {stats['p50_ms']:7.1f}ms  p95 {stats['p95_ms']:7.1f}ms  p99 {stats['p99_ms']:7.1f}ms  "
+                  f"errors {stats['error_rate']:.1%} {stats['statuses']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("❌ Throughput regressions against the baseline:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            return 1
+        print("✅ No throughput regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""app.py with a fake YouTube Music backend and an in-memory Firestore, for load tests.
+
+The fakes are swapped in before ``app`` is imported, so the service runs
+its normal startup and request paths against them. gunicorn loads it as
+``loadtest_app:app`` (see benchmarks/loadtest.py); the stand-ins are set
+up from environment variables:
+
+    FAKE_YTMUSIC_LATENCY_MS      median upstream latency (log-normal), default 150
+    FAKE_YTMUSIC_LATENCY_SIGMA   spread of the log-normal, default 0.4
+    FAKE_YTMUSIC_ERROR_RATE      fraction of calls failing with HTTP 500, default 0
+    FAKE_YTMUSIC_THROTTLE_RATE   fraction of calls failing with HTTP 429, default 0
+    FAKE_YTMUSIC_PER_TRACK_MS    extra playlist creation time per track, default 2
+    FAKE_FIRESTORE_LATENCY_MS    latency of every Firestore read/commit, default 20
+
+The Firestore stand-in lives in each worker process, so state such as
+job documents isn't shared between workers the way real Firestore is.
+"""
+import os
+import sys
+import json
+import time
+import types
+import random
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LATENCY_MS = float(os.getenv('FAKE_YTMUSIC_LATENCY_MS', '150'))
+LATENCY_SIGMA = float(os.getenv('FAKE_YTMUSIC_LATENCY_SIGMA', '0.4'))
+ERROR_RATE = float(os.getenv('FAKE_YTMUSIC_ERROR_RATE', '0'))
+THROTTLE_RATE = float(os.getenv('FAKE_YTMUSIC_THROTTLE_RATE', '0'))
+PER_TRACK_MS = float(os.getenv('FAKE_YTMUSIC_PER_TRACK_MS', '2'))
+FIRESTORE_LATENCY_MS = float(os.getenv('FAKE_FIRESTORE_LATENCY_MS', '20'))
+
+_VOCABULARY = ['love', 'night', 'fire', 'dream', 'heart', 'summer', 'rain', 'city', 'gold', 'ocean', 'light', 'run']
+
+
+def _firestore_delay() -> None:
+    if FIRESTORE_LATENCY_MS:
+        time.sleep(FIRESTORE_LATENCY_MS / 1000)
+
+
+class FakeYTMusic:
+    """Answers the ytmusicapi calls the service makes, with simulated latency and failures"""
+
+    def __init__(self, *args, **kwargs):
+        self._rng = random.Random()
+
+    def _upstream(self, extra_ms: float = 0.0) -> None:
+        time.sleep(self._rng.lognormvariate(0, LATENCY_SIGMA) * LATENCY_MS / 1000 + extra_ms / 1000)
+        roll = self._rng.random()
+        if roll < THROTTLE_RATE:
+            raise Exception('Server returned HTTP 429: Too Many Requests')
+        if roll < THROTTLE_RATE + ERROR_RATE:
+            raise Exception('Server returned HTTP 500: Internal Server Error')
+
+    def search(self, query: str, filter: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        self._upstream()
+        # One result carries the query itself, the rest are plausible noise to score
+        results = [{
+            'resultType': 'song',
+            'videoId': f'lt{abs(hash((query, i))) % 10 ** 9:09d}',
+            'title': ' '.join(self._rng.sample(_VOCABULARY, 3)).title(),
+            'artists': [{'name': f'Artist {self._rng.randint(1, 500)}'}],
+            'duration': '3:30',
+            'duration_seconds': 210
+        } for i in range(max(limit, 10) - 1)]
+        results.insert(self._rng.randint(0, len(results)), {
+            'resultType': 'song',
+            'videoId': f'lt{abs(hash(query)) % 10 ** 9:09d}',
+            'title': query,
+            'artists': [{'name': 'Loadtest'}],
+            'duration': '3:30',
+            'duration_seconds': 210
+        })
+        return results
+
+    def get_library_playlists(self, limit: int = 25) -> List[Dict[str, Any]]:
+        self._upstream()
+        return []
+
+    def create_playlist(self, title: str, description: str, privacy_status: str = 'PRIVATE',
+                        video_ids: Optional[List[str]] = None, **kwargs) -> str:
+        self._upstream(PER_TRACK_MS * len(video_ids or []))
+        return f'PLloadtest{self._rng.getrandbits(48):012x}'
+
+    def add_playlist_items(self, playlist_id: str, video_ids: List[str], duplicates: bool = False,
+                           **kwargs) -> Dict[str, Any]:
+        self._upstream(PER_TRACK_MS * len(video_ids))
+        return {'status': 'STATUS_SUCCEEDED', 'playlistEditResults': [{'videoId': v} for v in video_ids]}
+
+    def get_playlist(self, playlist_id: str, limit: Optional[int] = 100, **kwargs) -> Dict[str, Any]:
+        self._upstream()
+        return {'id': playlist_id, 'tracks': []}
+
+    def remove_playlist_items(self, playlist_id: str, videos: List[Dict[str, Any]]) -> str:
+        self._upstream(PER_TRACK_MS * len(videos))
+        return 'STATUS_SUCCEEDED'
+
+
+class _Snapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+
+class _DocumentRef:
+    def __init__(self, store: 'InMemoryFirestore', collection: str, doc_id: str):
+        self._store = store
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self) -> _Snapshot:
+        _firestore_delay()
+        return self._store.read(self._collection, self.id)
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        _firestore_delay()
+        self._store.write(self._collection, self.id, data, merge)
+
+    def update(self, data: Dict[str, Any]) -> None:
+        self.set(data, merge=True)
+
+    def delete(self) -> None:
+        _firestore_delay()
+        self._store.delete(self._collection, self.id)
+
+
+def _comparable(value: Any) -> Any:
+    # Firestore stores naive datetimes as UTC
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '>=': lambda a, b: a >= b,
+    '>': lambda a, b: a > b,
+    '<=': lambda a, b: a <= b,
+    '<': lambda a, b: a < b
+}
+
+
+def _matches(field_value: Any, op: str, value: Any) -> bool:
+    if op != '==' and field_value is None:
+        return False
+    return _OPERATORS[op](_comparable(field_value), _comparable(value))
+
+
+class _Query:
+    def __init__(self, store: 'InMemoryFirestore', collection: str, filters=()):
+        self._store = store
+        self._collection = collection
+        self._filters = filters
+
+    def where(self, field: str, op: str, value: Any) -> '_Query':
+        if op not in _OPERATORS:
+            raise NotImplementedError(f'Only {", ".join(_OPERATORS)} filters are supported, not {op}')
+        return _Query(self._store, self._collection, self._filters + ((field, op, value),))
+
+    def stream(self):
+        _firestore_delay()
+        return [
+            snapshot for snapshot in self._store.scan(self._collection)
+            if all(_matches(snapshot.to_dict().get(field), op, value) for field, op, value in self._filters)
+        ]
+
+    def on_snapshot(self, callback):
+        # No realtime listeners; the cancellation registry falls back to polling
+        raise NotImplementedError('Snapshot listeners are not supported by the in-memory Firestore')
+
+
+class _Collection(_Query):
+    def document(self, doc_id: str) -> _DocumentRef:
+        return _DocumentRef(self._store, self._collection, doc_id)
+
+
+class _WriteBatch:
+    def __init__(self, store: 'InMemoryFirestore'):
+        self._store = store
+        self._writes = []
+
+    def set(self, ref: _DocumentRef, data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append((ref, data, merge))
+
+    def commit(self) -> None:
+        _firestore_delay()
+        for ref, data, merge in self._writes:
+            self._store.write(ref._collection, ref.id, data, merge)
+
+
+class InMemoryFirestore:
+    """The subset of the Firestore client the service uses, kept in a dict"""
+
+    def __init__(self):
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name: str) -> _Collection:
+        return _Collection(self, name)
+
+    def batch(self) -> _WriteBatch:
+        return _WriteBatch(self)
+
+    def get_all(self, refs: List[_DocumentRef]) -> List[_Snapshot]:
+        _firestore_delay()
+        return [self.read(ref._collection, ref.id) for ref in refs]
+
+    def read(self, collection: str, doc_id: str) -> _Snapshot:
+        with self._lock:
+            data = self._collections.get(collection, {}).get(doc_id)
+            return _Snapshot(doc_id, dict(data) if data is not None else None)
+
+    def write(self, collection: str, doc_id: str, data: Dict[str, Any], merge: bool) -> None:
+        with self._lock:
+            docs = self._collections.setdefault(collection, {})
+            if merge and doc_id in docs:
+                docs[doc_id].update(data)
+            else:
+                docs[doc_id] = dict(data)
+
+    def delete(self, collection: str, doc_id: str) -> None:
+        with self._lock:
+            self._collections.get(collection, {}).pop(doc_id, None)
+
+    def scan(self, collection: str) -> List[_Snapshot]:
+        with self._lock:
+            return [_Snapshot(doc_id, dict(data)) for doc_id, data in self._collections.get(collection, {}).items()]
+
+
+def _install_stand_ins() -> None:
+    firestore_client = InMemoryFirestore()
+    firebase_admin = types.ModuleType('firebase_admin')
+    firebase_admin._apps = {'[DEFAULT]': object()}
+    firebase_admin.initialize_app = lambda *args, **kwargs: None
+    credentials = types.ModuleType('firebase_admin.credentials')
+    credentials.Certificate = lambda *args, **kwargs: None
+    firestore = types.ModuleType('firebase_admin.firestore')
+    firestore.client = lambda *args, **kwargs: firestore_client
+    firebase_admin.credentials = credentials
+    firebase_admin.firestore = firestore
+    sys.modules.update({
+        'firebase_admin': firebase_admin,
+        'firebase_admin.credentials': credentials,
+        'firebase_admin.firestore': firestore
+    })
+
+    import ytmusicapi
+    ytmusicapi.YTMusic = FakeYTMusic
+
+    # A token far from expiry, so startup never tries a real refresh
+    if not os.getenv('YTMUSIC_OAUTH_FILE'):
+        fd, oauth_file = tempfile.mkstemp(prefix='loadtest-oauth-', suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({
+                'access_token': 'loadtest',
+                'refresh_token': 'loadtest',
+                'token_type': 'Bearer',
+                'scope': 'https://www.googleapis.com/auth/youtube',
+                'expires_at': int(time.time()) + 30 * 24 * 3600,
+                'expires_in': 30 * 24 * 3600
+            }, f)
+        os.environ['YTMUSIC_OAUTH_FILE'] = oauth_file
+    os.environ.setdefault('GOOGLE_CLIENT_ID', 'loadtest')
+    os.environ.setdefault('GOOGLE_CLIENT_SECRET', 'loadtest')
+    os.environ.setdefault('CANCELLATION_LISTENER', 'false')
+
+
+_install_stand_ins()
+
+from app import app  # noqa: E402,F401
@@ -0,0 +1,295 @@
+"""Benchmark the matching hot path against recorded search results.
+
+Scores every fixture case with find_best_match and reports match
+accuracy, precision and recall at MATCH_THRESHOLD, per-call latency
+(p50/p95/p99, warm and cold normalize cache), throughput, per-call
+allocations (tracemalloc), and normalize_string / calculate_similarity
+micro timings.
+
+Usage:
+    python benchmarks/matcher_bench.py [--fixtures PATH ...] [--repeat N] [--window N]
+        [--baseline PATH] [--save-baseline] [--tolerance FRACTION] [--log-level LEVEL] [--trace]
+
+Logging is off by default. ``--log-level INFO`` writes the service's log
+lines to os.devnull and ``--trace`` records match traces the way app.py
+does, to measure what logging and tracing add to each call.
+
+With a baseline (benchmarks/baselines/matcher_bench.json by default) the
+run exits non-zero if accuracy, precision or recall drop at all, or if a
+latency or allocation figure gets worse by more than ``--tolerance``.
+Timings are only compared when the baseline used the same similarity
+backend; they are machine specific, so re-save the baseline
+(``--save-baseline``) when moving to different hardware.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matcher  # noqa: E402
+from match_trace import MatchTracer  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURES = [
+    os.path.join(BENCH_DIR, 'fixtures', 'search_results.json'),
+    os.path.join(BENCH_DIR, 'fixtures', 'matcher_corpus.json')
+]
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baselines', 'matcher_bench.json')
+
+# Any drop in these fails the run
+QUALITY_METRICS = ('accuracy', 'precision', 'recall')
+# Lower is better; fail when worse than the baseline by more than --tolerance
+COST_METRICS = ('warm_p50_us', 'warm_p95_us', 'cold_p50_us', 'alloc_peak_mean_kib')
+
+
+def load_cases(paths: List[str]) -> List[Dict[str, Any]]:
+    cases = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            cases += json.load(f)['cases']
+    return cases
+
+
+def _duration(case: Dict[str, Any]) -> Optional[float]:
+    duration_ms = case.get('durationMs')
+    return duration_ms / 1000 if duration_ms else None
+
+
+# Set by --trace: a ring buffer like app.py's, so traces are recorded (and sampled) per call
+tracer: Optional[MatchTracer] = None
+
+
+def _match(case: Dict[str, Any], window: int) -> Optional[Dict]:
+    if tracer is None:
+        return matcher.find_best_match(case['title'], case['artist'], case['results'], _duration(case), window)
+    trace = tracer.start(case['title'], case['artist'], _duration(case), window)
+    scores: List[float] = []
+    started = time.perf_counter()
+    match = matcher.find_best_match(case['title'], case['artist'], case['results'], _duration(case), window,
+                                    observe=scores.append, trace=trace)
+    tracer.finish(trace, match, scores[0] if scores else 0.0, time.perf_counter() - started)
+    return match
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def measure_quality(cases: List[Dict[str, Any]], window: int) -> Dict[str, Any]:
+    correct = predicted = correct_predicted = expected = 0
+    failures = []
+    for case in cases:
+        match = _match(case, window)
+        got = match.get('videoId') if match else None
+        want = case['expectedVideoId']
+        expected += want is not None
+        predicted += got is not None
+        if got == want:
+            correct += 1
+            correct_predicted += got is not None
+        else:
+            failures.append({'id': case['id'], 'expected': want, 'got': got})
+    return {
+        'accuracy': round(correct / len(cases), 4),
+        'precision': round(correct_predicted / predicted, 4) if predicted else 1.0,
+        'recall': round(correct_predicted / expected, 4) if expected else 1.0,
+        'failures': failures
+    }
+
+
+def measure_latency(cases: List[Dict[str, Any]], window: int, repeat: int) -> Dict[str, float]:
+    warm: List[float] = []
+    cold: List[float] = []
+    for _ in range(repeat):
+        for case in cases:
+            matcher.normalize_string.cache_clear()
+            started = time.perf_counter()
+            _match(case, window)
+            cold.append(time.perf_counter() - started)
+
+    for case in cases:
+        _match(case, window)
+    started_all = time.perf_counter()
+    for _ in range(repeat):
+        for case in cases:
+            started = time.perf_counter()
+            _match(case, window)
+            warm.append(time.perf_counter() - started)
+    elapsed = time.perf_counter() - started_all
+
+    return {
+        'warm_mean_us': round(sum(warm) / len(warm) * 1e6, 2),
+        'warm_p50_us': round(_percentile(warm, 50) * 1e6, 2),
+        'warm_p95_us': round(_percentile(warm, 95) * 1e6, 2),
+        'warm_p99_us': round(_percentile(warm, 99) * 1e6, 2),
+        'cold_p50_us': round(_percentile(cold, 50) * 1e6, 2),
+        'cold_p95_us': round(_percentile(cold, 95) * 1e6, 2),
+        'throughput_per_s': round(len(warm) / elapsed, 1)
+    }
+
+
+def measure_allocations(cases: List[Dict[str, Any]], window: int) -> Dict[str, float]:
+    """Peak traced memory per call (cold cache) and what a full pass leaves behind"""
+    matcher.normalize_string.cache_clear()
+    peaks = []
+    tracemalloc.start()
+    try:
+        before_pass, _ = tracemalloc.get_traced_memory()
+        for case in cases:
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            _match(case, window)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+        # The normalize cache holds on to strings by design; don't count it as retained
+        matcher.normalize_string.cache_clear()
+        after_pass, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'alloc_peak_mean_kib': round(sum(peaks) / len(peaks) / 1024, 2),
+        'alloc_peak_max_kib': round(max(peaks) / 1024, 2),
+        'alloc_retained_kib': round(max(0, after_pass - before_pass) / 1024, 2)
+    }
+
+
+def measure_primitives(cases: List[Dict[str, Any]], repeat: int) -> Dict[str, float]:
+    pairs = [
+        (case['title'], result.get('title', ''))
+        for case in cases for result in case['results']
+    ]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        matcher.normalize_string.cache_clear()
+        for query, title in pairs:
+            matcher.normalize_string(title)
+    normalize = (time.perf_counter() - started) / (repeat * len(pairs))
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for query, title in pairs:
+            matcher.calculate_similarity(query, title)
+    similarity = (time.perf_counter() - started) / (repeat * len(pairs))
+    return {
+        'normalize_string_ns': round(normalize * 1e9, 1),
+        'calculate_similarity_ns': round(similarity * 1e9, 1)
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for name in QUALITY_METRICS:
+        if current['metrics'][name] < baseline['metrics'][name] - 1e-9:
+            regressions.append(f"{name} dropped: {baseline['metrics'][name]} -> {current['metrics'][name]}")
+
+    newly_failing = {f['id'] for f in current['failures']} - {f['id'] for f in baseline.get('failures', [])}
+    if newly_failing:
+        regressions.append(f"cases that now fail: {', '.join(sorted(newly_failing))}")
+
+    if current['backend'] != baseline['backend']:
+        print(f"⚠️ Baseline used the {baseline['backend']} backend, this run {current['backend']}: timings not compared")
+        return regressions
+
+    for name in COST_METRICS:
+        before, now = baseline['metrics'][name], current['metrics'][name]
+        if before and now > before * (1 + tolerance):
+            regressions.append(f"{name} regressed {(now / before - 1) * 100:.0f}%: {before} -> {now}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixtures', nargs='+', default=DEFAULT_FIXTURES)
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--window', type=int, default=0)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='Write this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed latency/allocation slowdown before failing (0.25 = 25%%)')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO'],
+                        help='Log at this level to os.devnull instead of disabling logging')
+    parser.add_argument('--trace', action='store_true', help='Record match traces as app.py does')
+    parser.add_argument('--trace-sample-rate', type=float, default=0.01)
+    args = parser.parse_args()
+
+    global tracer
+    if args.log_level:
+        logging.basicConfig(level=args.log_level, stream=open(os.devnull, 'w'))
+    else:
+        logging.disable(logging.INFO)
+    if args.trace:
+        tracer = MatchTracer(500, args.trace_sample_rate)
+
+    cases = load_cases(args.fixtures)
+    quality = measure_quality(cases, args.window)
+    metrics = {
+        **{name: quality[name] for name in QUALITY_METRICS},
+        **measure_latency(cases, args.window, args.repeat),
+        **measure_allocations(cases, args.window),
+        **measure_primitives(cases, args.repeat)
+    }
+    current = {
+        'backend': matcher.backend.name,
+        'python': platform.python_version(),
+        'window': args.window,
+        'cases': len(cases),
+        'threshold': matcher.MATCH_THRESHOLD,
+        'metrics': metrics,
+        'failures': quality['failures']
+    }
+
+    print(f"backend: {current['backend']}, python: {current['python']}, window: {args.window or 'all'}, "
+          f"cases: {len(cases)}, threshold: {matcher.MATCH_THRESHOLD}, logging: {args.log_level or 'off'}, "
+          f"trace: {'on' if args.trace else 'off'}")
+    print(f"accuracy: {metrics['accuracy']:.2%}  precision: {metrics['precision']:.2%}  recall: {metrics['recall']:.2%}")
+    for failure in quality['failures']:
+        print(f"   ✗ {failure['id']}: expected {failure['expected']}, got {failure['got']}")
+    print(f"warm:  mean {metrics['warm_mean_us']:.1f} µs  p50 {metrics['warm_p50_us']:.1f}  "
+          f"p95 {metrics['warm_p95_us']:.1f}  p99 {metrics['warm_p99_us']:.1f}  ({metrics['throughput_per_s']:.0f} calls/s)")
+    print(f"cold:  p50 {metrics['cold_p50_us']:.1f} µs  p95 {metrics['cold_p95_us']:.1f}")
+    print(f"alloc: peak/call mean {metrics['alloc_peak_mean_kib']:.1f} KiB  max {metrics['alloc_peak_max_kib']:.1f} KiB  "
+          f"retained after pass {metrics['alloc_retained_kib']:.1f} KiB")
+    print(f"normalize_string: {metrics['normalize_string_ns']:.0f} ns  "
+          f"calculate_similarity: {metrics['calculate_similarity_ns']:.0f} ns")
+
+    if args.save_baseline:
+        if args.log_level or args.trace:
+            print("❌ Save the baseline without --log-level/--trace; it is compared against plain runs")
+            return 1
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"💾 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️ No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('window') != args.window or baseline.get('cases') != len(cases):
+        print("⚠️ Baseline was recorded with a different window or fixture set; re-save it to compare")
+        return 1
+
+    regressions = compare(current, baseline, args.tolerance)
+    if regressions:
+        print("❌ Regressions against the baseline:")
+        for regression in regressions:
+            print(f"   - {regression}")
+        return 1
+    print("✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
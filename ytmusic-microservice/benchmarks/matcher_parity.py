@@ -0,0 +1,132 @@
+"""Compare the matcher engine against the original per-pair SequenceMatcher scoring.
+
+Usage:
+    python benchmarks/matcher_parity.py [--fixtures PATH] [--repeat N] [--window N]
+
+Exits non-zero if any fixture ranks differently from the reference scorer.
+``--window`` scores the first N results before widening, like the service
+does with SEARCH_INITIAL_CANDIDATES; differences it causes are expected
+and reported separately.
+"""
+import os
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+from difflib import SequenceMatcher
+from typing import Optional, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matcher  # noqa: E402
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'search_results.json')
+
+
+def _reference_normalize(s: str) -> str:
+    s = re.sub(r'[^\w\s\-\'\&]', '', s.lower().strip())
+    return ' '.join(s.split())
+
+def _reference_similarity(str1: str, str2: str) -> float:
+    return SequenceMatcher(None, _reference_normalize(str1), _reference_normalize(str2)).ratio()
+
+def reference_rank(query_title: str, query_artist: str, results: List[Dict]) -> Tuple[Optional[Dict], float]:
+    """The original find_best_match scoring loop, without logging"""
+    best_match = None
+    best_score = 0.0
+    for result in results:
+        try:
+            result_title = result.get('title', '').strip()
+            if not result_title:
+                continue
+            artist_names = []
+            for artist in result.get('artists', []):
+                if isinstance(artist, dict):
+                    name = artist.get('name', '')
+                    if name:
+                        artist_names.append(name)
+                elif isinstance(artist, str):
+                    artist_names.append(artist)
+            result_artist = ', '.join(artist_names)
+
+            title_similarity = _reference_similarity(query_title, result_title)
+            artist_similarity = _reference_similarity(query_artist, result_artist)
+            individual = [
+                _reference_similarity(qa, name)
+                for qa in [a.strip() for a in query_artist.split(',')]
+                for name in artist_names
+            ]
+            artist_similarity = max(artist_similarity, max(individual) if individual else 0.0)
+
+            combined_score = (title_similarity * 0.75) + (artist_similarity * 0.25)
+            if _reference_normalize(query_title) == _reference_normalize(result_title):
+                combined_score += 0.1
+
+            if combined_score > best_score:
+                best_score = combined_score
+                best_match = result
+        except Exception:
+            continue
+    return best_match, best_score
+
+
+def _video_id(match: Optional[Dict], score: float) -> Optional[str]:
+    if match is None or score < matcher.MATCH_THRESHOLD:
+        return None
+    return match.get('videoId')
+
+def _time(fn, cases: List[Dict], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for case in cases:
+            fn(case['title'], case['artist'], case['results'])
+    return time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--window', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    with open(args.fixtures, 'r') as f:
+        cases = json.load(f)['cases']
+
+    def engine(title: str, artist: str, results: List[Dict]) -> Tuple[Optional[Dict], float]:
+        return matcher.rank_results(title, artist, results, window=args.window)
+
+    mismatches = 0
+    max_drift = 0.0
+    for case in cases:
+        ref_match, ref_score = reference_rank(case['title'], case['artist'], case['results'])
+        new_match, new_score = engine(case['title'], case['artist'], case['results'])
+        ref_id, new_id = _video_id(ref_match, ref_score), _video_id(new_match, new_score)
+        max_drift = max(max_drift, abs(ref_score - new_score))
+        if ref_id != new_id:
+            mismatches += 1
+            print(f"❌ {case['id']}: reference {ref_id} ({ref_score:.4f}) vs engine {new_id} ({new_score:.4f})")
+
+    # Cold timings: clear the normalization cache so repeats aren't free
+    matcher.normalize_string.cache_clear()
+    ref_time = _time(reference_rank, cases, args.repeat)
+    new_time = _time(lambda t, a, r: (matcher.normalize_string.cache_clear(), engine(t, a, r)), cases, args.repeat)
+    warm_time = _time(engine, cases, args.repeat)
+
+    calls = len(cases) * args.repeat
+    print(f"backend: {matcher.backend.name}, window: {args.window or 'all'}, fixtures: {len(cases)}, calls: {calls}")
+    print(f"reference: {ref_time / calls * 1e6:8.1f} µs/call")
+    print(f"engine:    {new_time / calls * 1e6:8.1f} µs/call ({ref_time / new_time:.2f}x, cold normalize cache)")
+    print(f"engine:    {warm_time / calls * 1e6:8.1f} µs/call ({ref_time / warm_time:.2f}x, warm normalize cache)")
+    print(f"ranking mismatches: {mismatches}, max best-score drift: {max_drift:.4f}")
+
+    # Windowed ranking trades exact parity for less scoring by design
+    return 1 if mismatches and not args.window else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
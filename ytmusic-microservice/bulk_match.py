@@ -0,0 +1,381 @@
+"""Match a track export against YouTube Music from the command line.
+
+Reads tracks from a JSONL or CSV file as a stream (or a JSON array /
+``{"tracks": [...]}`` file, which is loaded whole), searches them on a
+bounded thread pool, scores the results with ``find_best_match`` in a
+process pool, and appends one JSONL line per track to the output in
+input order. Each line is flushed as it's written, so ``--resume``
+picks up after the last complete line of an interrupted run.
+
+With ``--recorded`` no network calls are made: search results come from
+a JSONL file of ``{"query", "results"}`` lines, e.g. one written by an
+earlier online run with ``--record``. That makes re-tuning the matcher on
+a full corpus a matter of minutes.
+
+Usage:
+    python bulk_match.py tracks.csv matches.jsonl [--record searches.jsonl]
+    python bulk_match.py tracks.jsonl matches.jsonl --recorded searches.jsonl
+    python bulk_match.py tracks.jsonl matches.jsonl --resume
+
+Tracks need ``title`` and ``artist`` (or ``query``); ``id``, ``duration``
+(seconds or "m:ss") and ``durationMs`` are optional.
+Output lines carry the input ``index``, ``status`` (matched / unmatched /
+error), the ``match`` in /search result form and its ``score``.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from matcher import MATCH_THRESHOLD, find_best_match, normalize_string, parse_duration
+
+logger = logging.getLogger('bulk_match')
+
+
+def read_tracks(path: str, fmt: str = 'auto') -> Iterator[Dict[str, Any]]:
+    """Yield track dicts from a JSONL, CSV or JSON file"""
+    if fmt == 'auto':
+        fmt = os.path.splitext(path)[1].lstrip('.').lower()
+        fmt = 'jsonl' if fmt in ('jsonl', 'ndjson') else fmt
+    if fmt == 'jsonl':
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif fmt == 'csv':
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            yield from csv.DictReader(f)
+    elif fmt == 'json':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        yield from data.get('tracks', []) if isinstance(data, dict) else data
+    else:
+        raise ValueError(f'Unsupported track file format: {fmt}')
+
+
+def track_query(track: Dict[str, Any]) -> str:
+    """The search query the service would use for this track"""
+    query = str(track.get('query') or '').strip()
+    if query:
+        return query
+    return f"{str(track.get('title') or '').strip()} {str(track.get('artist') or '').strip()}".strip()
+
+
+def track_duration(track: Dict[str, Any]) -> Optional[float]:
+    """Source length in seconds from ``durationMs`` or ``duration`` (CSV values arrive as strings)"""
+    duration_ms = track.get('durationMs')
+    if duration_ms not in (None, ''):
+        try:
+            return parse_duration(float(duration_ms) / 1000)
+        except (TypeError, ValueError):
+            return None
+    return parse_duration(track.get('duration'))
+
+
+class RecordedSearch:
+    """Search results replayed from a ``{"query", "results"}`` JSONL file, keyed by normalized query"""
+
+    def __init__(self, path: str):
+        self.results: Dict[str, List[Dict]] = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.results[normalize_string(entry['query'])] = entry['results']
+
+    def __call__(self, query: str) -> List[Dict]:
+        results = self.results.get(normalize_string(query))
+        if results is None:
+            raise LookupError('No recorded results for this query')
+        return results
+
+
+class UpstreamSearch:
+    """ytmusic.search through the shared rate limiter, one client per search thread.
+
+    Searching doesn't need an account, so the clients are unauthenticated.
+    With ``record_path`` every result list is appended there for offline runs.
+    """
+
+    def __init__(self, limit: int, rate_limiter: Optional[Any], record_path: Optional[str] = None):
+        from ytmusicapi import YTMusic
+        from client_pool import build_session
+        self._make_client = lambda: YTMusic(requests_session=build_session(
+            1,
+            int(os.getenv('YTMUSIC_HTTP_RETRIES', '2')),
+            float(os.getenv('YTMUSIC_HTTP_TIMEOUT', '15'))
+        ))
+        self.limit = limit
+        self.rate_limiter = rate_limiter
+        self._local = threading.local()
+        self._record = open(record_path, 'a', encoding='utf-8') if record_path else None
+        self._record_lock = threading.Lock()
+
+    def _search(self, query: str) -> List[Dict]:
+        if not hasattr(self._local, 'client'):
+            self._local.client = self._make_client()
+        return self._local.client.search(query, filter='songs', limit=self.limit)
+
+    def __call__(self, query: str) -> List[Dict]:
+        if self.rate_limiter:
+            results = self.rate_limiter.call(self._search, query)
+        else:
+            results = self._search(query)
+        if self._record:
+            with self._record_lock:
+                self._record.write(json.dumps({'query': query, 'results': results}, ensure_ascii=False) + '\n')
+                self._record.flush()
+        return results
+
+    def close(self) -> None:
+        if self._record:
+            self._record.close()
+
+
+def _init_scorer() -> None:
+    # Per-candidate match logging would dominate the scoring time
+    logging.getLogger('matcher').setLevel(logging.WARNING)
+
+
+def score_batch(batch: List[Tuple[int, str, str, List[Dict], Optional[float]]],
+                window: int) -> List[Tuple[int, Optional[Dict], float]]:
+    """Score a batch of ``(index, title, artist, results, duration)``; runs in a worker process"""
+    scored = []
+    for index, title, artist, results, duration in batch:
+        scores: List[float] = []
+        match = find_best_match(title, artist, results, duration, window, observe=scores.append)
+        scored.append((index, match, scores[0] if scores else 0.0))
+    return scored
+
+
+def format_match(match: Dict) -> Dict[str, Any]:
+    """Same shape as a /search result"""
+    return {
+        'videoId': match.get('videoId'),
+        'title': match.get('title'),
+        'artists': match.get('artists', []),
+        'duration': match.get('duration')
+    }
+
+
+def resume_offset(output_path: str) -> int:
+    """Input index after the last complete line of an earlier output (a partly written line is dropped)"""
+    if not os.path.exists(output_path):
+        return 0
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            f.truncate(complete)
+    lines = data[:complete].splitlines()
+    return json.loads(lines[-1])['index'] + 1 if lines else 0
+
+
+class OrderedWriter:
+    """Writes records as JSONL in index order, holding back ones that finish early"""
+
+    def __init__(self, f, next_index: int):
+        self.f = f
+        self.next_index = next_index
+        self._held: Dict[int, Dict[str, Any]] = {}
+        self.counts = {'matched': 0, 'unmatched': 0, 'error': 0}
+
+    def add(self, record: Dict[str, Any]) -> None:
+        self._held[record['index']] = record
+        self.counts[record['status']] += 1
+        while self.next_index in self._held:
+            self.f.write(json.dumps(self._held.pop(self.next_index), ensure_ascii=False) + '\n')
+            self.next_index += 1
+        self.f.flush()
+
+
+def _record(index: int, track: Dict[str, Any], query: str) -> Dict[str, Any]:
+    return {
+        'index': index,
+        'id': track.get('id'),
+        'title': track.get('title', ''),
+        'artist': track.get('artist', ''),
+        'query': query
+    }
+
+
+def run(tracks: Iterator[Tuple[int, Dict[str, Any]]], search: Callable[[str], List[Dict]],
+        writer: OrderedWriter, search_executor: Optional[ThreadPoolExecutor],
+        score_executor: Optional[ProcessPoolExecutor], window: int, batch_size: int, max_in_flight: int) -> None:
+    """Search and score every track, keeping at most ``max_in_flight`` tracks in memory.
+
+    Without a search executor (recorded results) searches run inline;
+    without a score executor batches are scored in this process.
+    """
+    searching: Dict[Future, Tuple[int, Dict[str, Any], str]] = {}
+    scoring: Dict[Future, int] = {}
+    in_scoring = 0
+    ready: List[Tuple[int, str, str, List[Dict], Optional[float]]] = []
+    info: Dict[int, Dict[str, Any]] = {}
+    exhausted = False
+
+    def searched(index: int, track: Dict[str, Any], query: str, results: Optional[List[Dict]],
+                 error: Optional[Exception]) -> None:
+        record = _record(index, track, query)
+        if error is not None:
+            writer.add({**record, 'status': 'error', 'match': None, 'score': None, 'error': str(error)})
+        elif not results:
+            writer.add({**record, 'status': 'unmatched', 'match': None, 'score': 0.0})
+        else:
+            info[index] = record
+            ready.append((index, str(track.get('title') or ''), str(track.get('artist') or ''),
+                          results, track_duration(track)))
+
+    def scored(batch_results: List[Tuple[int, Optional[Dict], float]]) -> None:
+        for index, match, score in batch_results:
+            writer.add({
+                **info.pop(index),
+                'status': 'matched' if match else 'unmatched',
+                'match': format_match(match) if match else None,
+                'score': round(score, 4)
+            })
+
+    def submit_batch() -> None:
+        nonlocal in_scoring
+        batch = ready[:batch_size]
+        del ready[:batch_size]
+        if score_executor is None:
+            scored(score_batch(batch, window))
+            return
+        scoring[score_executor.submit(score_batch, batch, window)] = len(batch)
+        in_scoring += len(batch)
+
+    while True:
+        while not exhausted and len(searching) + len(ready) + in_scoring < max_in_flight:
+            item = next(tracks, None)
+            if item is None:
+                exhausted = True
+                break
+            index, track = item
+            query = track_query(track)
+            if not query:
+                writer.add({**_record(index, track, query), 'status': 'error', 'match': None,
+                            'score': None, 'error': 'Track needs a title, artist or query'})
+            elif search_executor is None:
+                try:
+                    searched(index, track, query, search(query), None)
+                except Exception as e:
+                    searched(index, track, query, None, e)
+            else:
+                searching[search_executor.submit(search, query)] = (index, track, query)
+            if len(ready) >= batch_size:
+                submit_batch()
+
+        # Score a partial batch once no search or reading more tracks can fill it
+        if ready and (len(ready) >= batch_size or not searching and (exhausted or not scoring)):
+            submit_batch()
+            continue
+
+        if not (searching or scoring):
+            if exhausted and not ready:
+                return
+            continue
+
+        done, _ = wait(list(searching) + list(scoring), return_when=FIRST_COMPLETED)
+        for future in done:
+            if future in searching:
+                index, track, query = searching.pop(future)
+                error = future.exception()
+                searched(index, track, query, None if error else future.result(), error)
+            else:
+                in_scoring -= scoring.pop(future)
+                scored(future.result())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help='Track file (.jsonl, .csv or .json)')
+    parser.add_argument('output', help='JSONL file to append matches to')
+    parser.add_argument('--format', default='auto', choices=['auto', 'jsonl', 'csv', 'json'])
+    parser.add_argument('--recorded', help='Score against recorded search results instead of searching')
+    parser.add_argument('--record', help='Append every search result list to this JSONL file')
+    parser.add_argument('--resume', action='store_true', help='Continue after the last complete line of the output')
+    parser.add_argument('--start', type=int, default=0, help='Skip this many input tracks')
+    parser.add_argument('--search-workers', type=int, default=int(os.getenv('SEARCH_BATCH_MAX_WORKERS', '4')))
+    parser.add_argument('--score-workers', type=int, default=os.cpu_count() or 1,
+                        help='Scoring processes (0 scores in this process)')
+    parser.add_argument('--batch-size', type=int, default=64, help='Tracks per scoring task')
+    parser.add_argument('--limit', type=int, default=int(os.getenv('SEARCH_RESULT_LIMIT', '10')))
+    parser.add_argument('--window', type=int, default=int(os.getenv('SEARCH_INITIAL_CANDIDATES', '0')),
+                        help='Score the first N results before the rest (0 scores all at once)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    _init_scorer()
+
+    offset = args.start
+    if args.resume:
+        offset = max(offset, resume_offset(args.output))
+    tracks = itertools.islice(enumerate(read_tracks(args.input, args.format)), offset, None)
+
+    if args.recorded:
+        search = RecordedSearch(args.recorded)
+        search_executor = None
+    else:
+        rate_limiter = None
+        if os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true':
+            from rate_limiter import AdaptiveRateLimiter
+            rate_limiter = AdaptiveRateLimiter(
+                os.getenv('RATE_LIMIT_STATE_PATH', 'cache/ytmusic_rate_limit.bin'),
+                initial_rate=float(os.getenv('RATE_LIMIT_INITIAL_RATE', '5')),
+                min_rate=float(os.getenv('RATE_LIMIT_MIN_RATE', '0.5')),
+                max_rate=float(os.getenv('RATE_LIMIT_MAX_RATE', '20')),
+                burst=float(os.getenv('RATE_LIMIT_BURST', '5')),
+                increase=float(os.getenv('RATE_LIMIT_INCREASE', '0.1')),
+                backoff=float(os.getenv('RATE_LIMIT_BACKOFF', '0.5')),
+                max_wait=float(os.getenv('RATE_LIMIT_MAX_WAIT', '60'))
+            )
+        search = UpstreamSearch(args.limit, rate_limiter, args.record)
+        search_executor = ThreadPoolExecutor(max_workers=max(1, args.search_workers), thread_name_prefix='search')
+
+    score_executor = None
+    if args.score_workers > 0:
+        score_executor = ProcessPoolExecutor(max_workers=args.score_workers, initializer=_init_scorer)
+
+    started = time.time()
+    max_in_flight = max(args.batch_size * max(1, args.score_workers) * 2, args.search_workers * 4)
+    logger.info(f"🚚 Matching {args.input} from track {offset} ({'recorded results' if args.recorded else 'live search'}, "
+                f"threshold {MATCH_THRESHOLD})")
+    completed = False
+    try:
+        with open(args.output, 'a', encoding='utf-8') as out:
+            writer = OrderedWriter(out, offset)
+            try:
+                run(tracks, search, writer, search_executor, score_executor,
+                    args.window, max(1, args.batch_size), max_in_flight)
+                completed = True
+            except KeyboardInterrupt:
+                logger.warning(f"⚠️ Interrupted; rerun with --resume to continue from track {writer.next_index}")
+                return 130
+    finally:
+        # Let the pools wind down cleanly after a full run; abandon queued work only on an interrupt or error
+        for executor in (search_executor, score_executor):
+            if executor:
+                executor.shutdown(wait=completed, cancel_futures=not completed)
+        if isinstance(search, UpstreamSearch):
+            search.close()
+
+    processed = writer.next_index - offset
+    elapsed = time.time() - started
+    logger.info(f"✅ {processed} tracks in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.1f}/s): "
+                f"{writer.counts['matched']} matched, {writer.counts['unmatched']} unmatched, {writer.counts['error']} errors")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
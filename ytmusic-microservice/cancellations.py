@@ -0,0 +1,197 @@
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CancellationRegistry:
+    """In-memory set of cancelled conversion IDs kept in sync with Firestore.
+
+    A snapshot listener on ``conversion-jobs`` documents with
+    ``status == 'cancelled'`` pushes cancellations as they happen. If the
+    listener can't be started (or dies), a thread re-runs the same query
+    every ``poll_interval`` seconds instead. Checks are then a set lookup,
+    with no Firestore round trip per request.
+
+    Only cancellations from the last ``retention`` seconds (by ``updatedAt``)
+    are loaded and kept, so startup and polling reads don't grow with the
+    collection's history. The query needs the composite ``status`` +
+    ``updatedAt`` index from firestore.indexes.json. While neither the
+    listener nor polling is working (e.g. the index is missing), checks
+    fall back to reading the conversion's own document.
+    """
+
+    # Drop expired IDs (and move the listener's window forward) at most this often
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, db: Any, collection: str = 'conversion-jobs', poll_interval: float = 5.0,
+                 retention: float = 3600.0):
+        self.db = db
+        self.collection = collection
+        self.poll_interval = poll_interval
+        self.retention = retention
+        # conversion ID -> when it was cancelled (epoch seconds)
+        self._cancelled: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._pruned_at = time.time()
+        self._watch = None
+        self._watch_started_at = 0.0
+        self._poll_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.mode = 'stopped'
+        self.last_sync_at: Optional[datetime] = None
+        self.errors = 0
+        # True while the set can't be trusted: no listener snapshot or successful poll yet
+        self._degraded = True
+        # conversion ID -> (checked at, cancelled) for direct document reads while degraded
+        self._direct: Dict[str, tuple] = {}
+        self.direct_reads = 0
+
+    def _query(self):
+        since = datetime.now(timezone.utc) - timedelta(seconds=self.retention)
+        return (self.db.collection(self.collection)
+                .where('status', '==', 'cancelled')
+                .where('updatedAt', '>=', since))
+
+    @staticmethod
+    def _cancelled_at(data: Optional[Dict[str, Any]]) -> float:
+        updated_at = (data or {}).get('updatedAt')
+        if isinstance(updated_at, datetime):
+            if updated_at.tzinfo is None:
+                updated_at = updated_at.replace(tzinfo=timezone.utc)
+            return updated_at.timestamp()
+        return time.time()
+
+    def start(self, use_listener: bool = True) -> None:
+        if use_listener:
+            try:
+                self._watch = self._query().on_snapshot(self._on_snapshot)
+                self._watch_started_at = time.time()
+                self.mode = 'listener'
+                logger.info("✅ Listening for cancelled conversions")
+                return
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"⚠️ Cancellation listener unavailable, polling instead: {str(e)}")
+        self._start_polling()
+
+    def _start_polling(self) -> None:
+        if self._poll_thread and self._poll_thread.is_alive():
+            return
+        self.mode = 'polling'
+        self._stop.clear()
+        self._poll_thread = threading.Thread(target=self._poll, name='cancellation-poll', daemon=True)
+        self._poll_thread.start()
+
+    def _on_snapshot(self, snapshot, changes, read_time) -> None:
+        with self._lock:
+            for change in changes:
+                doc_id = change.document.id
+                if change.type.name == 'REMOVED':
+                    self._cancelled.pop(doc_id, None)
+                else:
+                    if doc_id not in self._cancelled:
+                        logger.info(f"🛑 Conversion {doc_id} cancelled")
+                    self._cancelled[doc_id] = self._cancelled_at(change.document.to_dict())
+        self.last_sync_at = datetime.now()
+        self._degraded = False
+
+    def _poll(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with metrics.timer(metrics.FIRESTORE_READ_SECONDS, operation='cancellations_poll'):
+                    cancelled = {doc.id: self._cancelled_at(doc.to_dict()) for doc in self._query().stream()}
+                with self._lock:
+                    self._cancelled = cancelled
+                self.last_sync_at = datetime.now()
+                self._degraded = False
+            except Exception as e:
+                self.errors += 1
+                self._degraded = True
+                logger.warning(f"⚠️ Cancellation poll failed, reading job documents directly: {str(e)}")
+            self._stop.wait(self.poll_interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self.mode = 'stopped'
+
+    def _prune(self) -> None:
+        """Forget cancellations older than the retention window"""
+        now = time.time()
+        if now - self._pruned_at < self.PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        cutoff = now - self.retention
+        with self._lock:
+            self._cancelled = {k: v for k, v in self._cancelled.items() if v >= cutoff}
+        # The listener's query bound was fixed when it subscribed; move it forward
+        if self.mode == 'listener' and self._watch is not None and now - self._watch_started_at > self.retention:
+            try:
+                self._watch.unsubscribe()
+                self._watch = self._query().on_snapshot(self._on_snapshot)
+                self._watch_started_at = now
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"⚠️ Cancellation listener restart failed, polling instead: {str(e)}")
+                self._watch = None
+                self._start_polling()
+
+    def is_cancelled(self, conversion_id: Optional[str]) -> bool:
+        if not conversion_id:
+            return False
+        self._prune()
+        if self.mode == 'listener' and self._watch is not None and getattr(self._watch, 'is_active', True) is False:
+            # The listener gave up (e.g. permission or network error); keep going by polling
+            logger.warning("⚠️ Cancellation listener stopped, switching to polling")
+            self._watch = None
+            self._start_polling()
+        with self._lock:
+            if conversion_id in self._cancelled:
+                return True
+        if self._degraded:
+            return self._read_cancelled(conversion_id)
+        return False
+
+    def _read_cancelled(self, conversion_id: str) -> bool:
+        """Read the conversion's document, reusing the answer for one poll interval"""
+        checked = self._direct.get(conversion_id)
+        if checked and time.time() - checked[0] < self.poll_interval:
+            return checked[1]
+        try:
+            with metrics.timer(metrics.FIRESTORE_READ_SECONDS, operation='cancellation_get'):
+                doc = self.db.collection(self.collection).document(conversion_id).get()
+            cancelled = doc.exists and (doc.to_dict() or {}).get('status') == 'cancelled'
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Reading conversion {conversion_id} failed: {str(e)}")
+            return checked[1] if checked else False
+        self.direct_reads += 1
+        if len(self._direct) > 10000:
+            self._direct.clear()
+        self._direct[conversion_id] = (time.time(), cancelled)
+        return cancelled
+
+    def mark_cancelled(self, conversion_id: str) -> None:
+        with self._lock:
+            self._cancelled[conversion_id] = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = len(self._cancelled)
+        return {
+            'mode': self.mode,
+            'cancelled': count,
+            'retention_s': self.retention,
+            'degraded': self._degraded,
+            'direct_reads': self.direct_reads,
+            'last_sync_at': self.last_sync_at.isoformat() if self.last_sync_at else None,
+            'errors': self.errors
+        }
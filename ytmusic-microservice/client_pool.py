@@ -0,0 +1,123 @@
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Dict, Iterator, List
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class PoolTimeout(Exception):
+    """Raised when no client could be checked out in time"""
+
+
+# ytmusicapi sends every call, reads and edits alike, as a POST to youtubei/v1/<endpoint>
+SEARCH_URL_PREFIX = 'https://music.youtube.com/youtubei/v1/search'
+
+
+def build_session(pool_maxsize: int, retries: int, timeout: float) -> requests.Session:
+    """A keep-alive session with connection pooling and connect retries.
+
+    Only search requests are also retried on 502/503/504: the other POSTs
+    include playlist creation and edits, and replaying one of those after
+    the server already applied it would duplicate the playlist or change.
+    429s are deliberately never retried here: the rate limiter needs to see
+    them to back off.
+    """
+    session = requests.Session()
+    connect_only = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=0,
+        backoff_factor=0.3,
+        allowed_methods=frozenset(['GET', 'POST']),
+        raise_on_status=False
+    )
+    search_retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'POST']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=connect_only)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # requests picks the adapter with the longest matching prefix
+    session.mount(SEARCH_URL_PREFIX, HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize,
+                                                 max_retries=search_retry))
+    # Same default request timeout ytmusicapi applies to its own sessions
+    session.request = partial(session.request, timeout=timeout)
+    return session
+
+
+class ClientPool:
+    """Fixed set of YTMusic clients checked out one request at a time.
+
+    LIFO order keeps recently used clients (and their warm TLS
+    connections) in rotation when the pool is under-utilized.
+    """
+
+    def __init__(self, clients: List[Any], checkout_timeout: float):
+        self.clients = list(clients)
+        self.checkout_timeout = checkout_timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        for client in self.clients:
+            self._idle.put(client)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.busy_time = 0.0
+
+    @contextmanager
+    def client(self) -> Iterator[Any]:
+        started = time.time()
+        try:
+            client = self._idle.get(block=False)
+        except queue.Empty:
+            try:
+                client = self._idle.get(timeout=self.checkout_timeout)
+            except queue.Empty:
+                raise PoolTimeout(f'No YTMusic client free after {self.checkout_timeout}s')
+        checked_out = time.time()
+        wait = checked_out - started
+
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            if wait > 0.001:
+                self.waited += 1
+
+        try:
+            yield client
+        finally:
+            with self._lock:
+                self.in_use -= 1
+                self.busy_time += time.time() - checked_out
+            self._idle.put(client)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'size': len(self.clients),
+                'in_use': self.in_use,
+                'peak_in_use': self.peak_in_use,
+                'checkouts': self.checkouts,
+                'waited': self.waited,
+                'avg_wait_ms': round(self.total_wait / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 2),
+                'busy_seconds': round(self.busy_time, 2)
+            }
@@ -0,0 +1,55 @@
+import os
+
+from dotenv import load_dotenv
+
+# Same .env the app reads, so GUNICORN_* and PROMETHEUS_MULTIPROC_DIR can live there too
+load_dotenv()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8080')
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+
+# sync, gthread (with GUNICORN_THREADS) or gevent (needs the gevent package);
+# benchmarks/loadtest.py compares them
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '100'))
+# The app caps /search-stream lists under sync workers, which are killed
+# after `timeout` seconds even while a response is still streaming
+os.environ['GUNICORN_WORKER_CLASS'] = worker_class
+os.environ['GUNICORN_TIMEOUT'] = str(timeout)
+
+# Import the app once in the master and fork workers from it. Network
+# clients (YTMusic sessions, Firestore) are still created per worker in
+# post_fork, since sockets and gRPC channels can't be shared across a fork.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() == 'true'
+if preload_app:
+    os.environ['YTMUSIC_DEFER_WARMUP'] = 'true'
+
+# Prometheus multiprocess mode: each worker writes its metrics to files in
+# this directory and /metrics sums them, so counts don't depend on which
+# worker answers the scrape. Must be set before anything imports the app.
+metrics_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR', '/tmp/ytmusic-metrics')
+os.environ['PROMETHEUS_MULTIPROC_DIR'] = metrics_dir
+os.makedirs(metrics_dir, exist_ok=True)
+
+
+def on_starting(server):
+    # Samples left by a previous run would otherwise be added to this one's
+    import shutil
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import app
+        app.start_warmup()
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,327 @@
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, Executor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Firestore caps a batched write at 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once its conversion has been cancelled"""
+
+
+class ProgressWriter:
+    """Coalesced, batched status writes to ``conversion-jobs`` documents.
+
+    Updates are merged per document in memory and flushed every
+    ``flush_interval`` seconds in a single batched commit, so a job that
+    reports progress after every track costs one write per interval, not
+    one per track. Terminal updates flush immediately.
+    """
+
+    def __init__(self, db: Any, is_cancelled: Callable[[str], bool],
+                 collection: str = 'conversion-jobs', flush_interval: float = 2.0):
+        self.db = db
+        self.is_cancelled = is_cancelled
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='progress-writer', daemon=True)
+        self._thread.start()
+        self.updates = 0
+        self.documents_written = 0
+        self.commits = 0
+        self.errors = 0
+
+    def update(self, conversion_id: str, status: str, progress: int,
+               result: Optional[Dict[str, Any]] = None, final: bool = False) -> None:
+        data: Dict[str, Any] = {
+            'status': status,
+            'progress': progress,
+            'updatedAt': datetime.now(timezone.utc)
+        }
+        if result is not None:
+            data['result'] = result
+
+        with self._lock:
+            self._pending.setdefault(conversion_id, {}).update(data)
+            self.updates += 1
+
+        if final:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+
+            items = [
+                (conversion_id, data) for conversion_id, data in pending.items()
+                # Don't let a late progress write overwrite a cancellation
+                if data.get('status') == 'cancelled' or not self.is_cancelled(conversion_id)
+            ]
+
+            for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+                chunk = items[start:start + FIRESTORE_BATCH_LIMIT]
+                try:
+                    batch = self.db.batch()
+                    for conversion_id, data in chunk:
+                        # Merge only these top-level fields: ``result`` is replaced as a whole, so
+                        # progress keys (currentTrack, processed...) don't linger in the final result
+                        batch.set(self.db.collection(self.collection).document(conversion_id), data,
+                                  merge=list(data))
+                    batch.commit()
+                    self.commits += 1
+                    self.documents_written += len(chunk)
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"⚠️ Progress write failed for {len(chunk)} jobs: {str(e)}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'updates': self.updates,
+            'documents_written': self.documents_written,
+            'commits': self.commits,
+            'errors': self.errors
+        }
+
+
+class ConversionJob:
+    """One track-list-to-playlist conversion running in this process"""
+
+    def __init__(self, job_id: str, tracks: List[Dict[str, Any]], title: str,
+                 description: str, source_url: str):
+        self.id = job_id
+        self.tracks = tracks
+        self.title = title
+        self.description = description
+        self.source_url = source_url
+        self.status = 'started'
+        self.progress = 0
+        self.processed = 0
+        self.matched = 0
+        self.results: List[Optional[Dict[str, Any]]] = [None] * len(tracks)
+        self.playlist: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.cancel_requested = False
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'jobId': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'processed': self.processed,
+            'total': len(self.tracks),
+            'matched': self.matched,
+            'playlist': self.playlist,
+            'error': self.error,
+            'createdAt': datetime.fromtimestamp(self.created_at).isoformat(),
+            'finishedAt': datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None
+        }
+
+
+class JobRunner:
+    """Runs conversion jobs on a background worker pool.
+
+    Each job warms the cache for its whole track list, searches the tracks
+    on the shared search executor (bounded in-flight window), creates the
+    playlist, and reports progress in the same ``conversion-jobs``
+    document format the backend uses.
+    """
+
+    def __init__(self, search_fn: Callable[..., Dict[str, Any]],
+                 create_playlist_fn: Callable[[str, str, List[str], str], Dict[str, Any]],
+                 is_cancelled: Callable[[str], bool],
+                 prefetch_fn: Callable[[List[Dict[str, Any]]], int],
+                 search_executor: Executor, search_window: int,
+                 progress: Optional[ProgressWriter], max_jobs: int, retention: float):
+        self.search_fn = search_fn
+        self.create_playlist_fn = create_playlist_fn
+        self.is_cancelled = is_cancelled
+        self.prefetch_fn = prefetch_fn
+        self.search_executor = search_executor
+        self.search_window = search_window
+        self.progress = progress
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='job')
+        self._jobs: Dict[str, ConversionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, tracks: List[Dict[str, Any]], title: str, description: str = '',
+               source_url: str = '', job_id: Optional[str] = None) -> ConversionJob:
+        self._prune()
+        job = ConversionJob(job_id or uuid.uuid4().hex, tracks, title, description, source_url)
+        with self._lock:
+            existing = self._jobs.get(job.id)
+            if existing and not existing.finished:
+                raise ValueError(f'Job {job.id} is already running')
+            self._jobs[job.id] = job
+        self._report(job, 'started', 0)
+        self._executor.submit(self._run, job)
+        logger.info(f"🧾 Queued job {job.id} with {len(tracks)} tracks")
+        return job
+
+    def get(self, job_id: str) -> Optional[ConversionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if not job or job.finished:
+            return False
+        job.cancel_requested = True
+        return True
+
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values()
+                           if j.finished and j.finished_at is not None and j.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def _report(self, job: ConversionJob, status: str, progress: int,
+                result: Optional[Dict[str, Any]] = None, final: bool = False) -> None:
+        # Set before the terminal status is visible, and before the (slow) final flush
+        if final:
+            job.finished_at = time.time()
+        job.status = status
+        job.progress = progress
+        if self.progress:
+            self.progress.update(job.id, status, progress, result, final=final)
+
+    def _check_cancelled(self, job: ConversionJob) -> None:
+        if job.cancel_requested or self.is_cancelled(job.id):
+            raise JobCancelled()
+
+    def _search_track(self, index: int, track: Dict[str, Any]) -> Dict[str, Any]:
+        conversion_track = {
+            'originalTitle': track.get('title', ''),
+            'originalArtist': track.get('artist', ''),
+            'spotifyUrl': track.get('spotifyUrl', ''),
+            'success': False
+        }
+        try:
+            outcome = self.search_fn(track.get('title', ''), track.get('artist', ''), duration=track.get('duration'))
+            if outcome['result']:
+                conversion_track['ytMusicResult'] = outcome['result']
+                conversion_track['success'] = True
+            else:
+                conversion_track['error'] = 'No matching track found on YouTube Music'
+        except Exception as e:
+            conversion_track['error'] = str(e)
+        return conversion_track
+
+    def _search_all(self, job: ConversionJob) -> None:
+        total = len(job.tracks)
+        pending = {}
+        next_index = 0
+
+        try:
+            while next_index < total or pending:
+                self._check_cancelled(job)
+                while next_index < total and len(pending) < self.search_window:
+                    future = self.search_executor.submit(self._search_track, next_index, job.tracks[next_index])
+                    pending[future] = next_index
+                    next_index += 1
+
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    job.results[index] = future.result()
+                    job.processed += 1
+                    if job.results[index]['success']:
+                        job.matched += 1
+
+                current = job.results[index]
+                # Same 30-65% band the backend uses for the track phase
+                self._report(job, 'converting-tracks', 30 + int(job.processed / total * 35), {
+                    'currentTrack': f"{current['originalTitle']} by {current['originalArtist']}",
+                    'processed': job.processed,
+                    'total': total
+                })
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _run(self, job: ConversionJob) -> None:
+        started = time.time()
+        try:
+            self._check_cancelled(job)
+            self._report(job, 'converting-tracks', 30)
+            # One bulk cache read up front instead of a lookup per track
+            self.prefetch_fn(job.tracks)
+            self._search_all(job)
+
+            self._check_cancelled(job)
+            video_ids = [t['ytMusicResult']['videoId'] for t in job.results if t and t['success']]
+            self._report(job, 'converting-tracks', 75, {
+                'message': f'Creating playlist with {len(video_ids)} found tracks...',
+                'tracksToAdd': len(video_ids),
+                'currentTrack': None
+            })
+
+            job.playlist = self.create_playlist_fn(job.title, job.description, video_ids, job.id)
+
+            self._check_cancelled(job)
+            successful = sum(1 for t in job.results if t and t['success'])
+            self._report(job, 'completed', 100, {
+                'spotifyPlaylistUrl': job.source_url,
+                'ytMusicPlaylistUrl': job.playlist['url'],
+                'ytMusicPlaylist': {
+                    'playlistId': job.playlist['playlistId'],
+                    'title': job.playlist['title'],
+                    'description': job.playlist['description'],
+                    'url': job.playlist['url']
+                },
+                'tracks': job.results,
+                'totalTracks': len(job.tracks),
+                'successfulTracks': successful,
+                'failedTracks': len(job.tracks) - successful,
+                'conversionId': job.id,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            }, final=True)
+            logger.info(f"✅ Job {job.id} completed: {successful}/{len(job.tracks)} tracks in {time.time() - started:.1f}s")
+
+        except Exception as e:
+            if not (isinstance(e, JobCancelled) or job.cancel_requested or self.is_cancelled(job.id)):
+                logger.error(f"❌ Job {job.id} failed: {str(e)}")
+                job.error = str(e)
+                self._report(job, 'failed', 0, {'error': str(e) or 'Conversion failed'}, final=True)
+                return
+            logger.info(f"🛑 Job {job.id} cancelled after {job.processed}/{len(job.tracks)} tracks")
+            self._report(job, 'cancelled', 0, {
+                'error': 'Conversion cancelled by user',
+                'cancelledAt': datetime.now(timezone.utc).isoformat()
+            }, final=True)
+        finally:
+            if job.finished_at is None:
+                job.finished_at = time.time()
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+class MatchCache:
+    """On-disk cache of search matches backed by SQLite.
+
+    The database file is shared by every gunicorn worker on the host, so a
+    match found by one worker is reused by the others and survives restarts.
+    Positive and negative (no match) results have separate TTLs, and the
+    table is trimmed back to ``max_entries`` by least-recent access.
+    """
+
+    # Only rewrite last_access on a hit when the stored value is this stale
+    TOUCH_INTERVAL = 60
+    # Check the table size every N writes
+    EVICT_EVERY = 100
+    # Hit/miss counts are kept in memory and added to the shared stats table
+    # at most this often (on a write or a stats() call), so reads never
+    # take the SQLite write lock just to count themselves
+    STATS_FLUSH_INTERVAL = 30
+
+    def __init__(self, path: str, ttl: int, negative_ttl: int, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._counts_lock = threading.Lock()
+        self._counts_pid = os.getpid()
+        self._flushed_at = time.time()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS matches ('
+                ' key TEXT PRIMARY KEY,'
+                ' result TEXT,'
+                ' message TEXT,'
+                ' expires_at REAL NOT NULL,'
+                ' last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_matches_last_access ON matches(last_access)')
+            conn.execute('CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+
+    def _conn(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use.
+
+        Connections are never reused across a fork (gunicorn preload).
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _bump(self, conn: sqlite3.Connection, name: str, amount: int = 1) -> None:
+        conn.execute(
+            'INSERT INTO stats (name, value) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            (name, amount)
+        )
+
+    def _count(self, name: str) -> None:
+        with self._counts_lock:
+            # Counts taken before a fork belong to the parent
+            if self._counts_pid != os.getpid():
+                self._counts, self._counts_pid = {}, os.getpid()
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def _flush_counts(self, force: bool = False) -> None:
+        """Add this process's pending hit/miss counts to the shared stats table"""
+        with self._counts_lock:
+            if self._counts_pid != os.getpid():
+                self._counts, self._counts_pid = {}, os.getpid()
+            if not self._counts or not (force or time.time() - self._flushed_at >= self.STATS_FLUSH_INTERVAL):
+                return
+            counts, self._counts = self._counts, {}
+            self._flushed_at = time.time()
+        try:
+            conn = self._conn()
+            with conn:
+                for name, amount in counts.items():
+                    self._bump(conn, name, amount)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Match cache stats flush failed: {str(e)}")
+            with self._counts_lock:
+                for name, amount in counts.items():
+                    self._counts[name] = self._counts.get(name, 0) + amount
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return ``{'result', 'message'}`` for a fresh entry, or None on a miss"""
+        try:
+            conn = self._conn()
+            now = time.time()
+            row = conn.execute(
+                'SELECT result, message, expires_at, last_access FROM matches WHERE key = ?',
+                (key,)
+            ).fetchone()
+
+            # Expired rows are left for evict(); a miss is a pure read
+            if row is None or row[2] <= now:
+                self._count('misses')
+                return None
+
+            self._count('hits' if row[0] is not None else 'negative_hits')
+            if now - row[3] > self.TOUCH_INTERVAL:
+                try:
+                    with conn:
+                        conn.execute('UPDATE matches SET last_access = ? WHERE key = ?', (now, key))
+                except sqlite3.Error as e:
+                    # Only the LRU order suffers; the hit still counts
+                    logger.debug(f"Match cache touch skipped: {str(e)}")
+
+            return {
+                'result': json.loads(row[0]) if row[0] is not None else None,
+                'message': row[1]
+            }
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Match cache read failed: {str(e)}")
+            return None
+
+    def fresh_keys(self, keys: List[str]) -> Set[str]:
+        """Which of these keys have a fresh entry (no hit/miss counting)"""
+        fresh: Set[str] = set()
+        try:
+            conn = self._conn()
+            now = time.time()
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key FROM matches WHERE key IN ({','.join('?' * len(chunk))}) AND expires_at > ?",
+                    (*chunk, now)
+                ).fetchall()
+                fresh.update(row[0] for row in rows)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Match cache read failed: {str(e)}")
+        return fresh
+
+    def set(self, key: str, result: Optional[Dict[str, Any]], message: str, ttl: Optional[int] = None) -> None:
+        """Store a match; ``result=None`` records a negative entry with the shorter TTL unless ``ttl`` is given"""
+        try:
+            conn = self._conn()
+            now = time.time()
+            if ttl is None:
+                ttl = self.ttl if result is not None else self.negative_ttl
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO matches (key, result, message, expires_at, last_access) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, json.dumps(result) if result is not None else None, message, now + ttl, now)
+                )
+
+            with self._writes_lock:
+                self._writes += 1
+                should_evict = self._writes % self.EVICT_EVERY == 0
+            if should_evict:
+                self.evict()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Match cache write failed: {str(e)}")
+        self._flush_counts()
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used ones above max_entries"""
+        conn = self._conn()
+        with conn:
+            removed = conn.execute('DELETE FROM matches WHERE expires_at <= ?', (time.time(),)).rowcount
+            count = conn.execute('SELECT COUNT(*) FROM matches').fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                removed += conn.execute(
+                    'DELETE FROM matches WHERE key IN '
+                    '(SELECT key FROM matches ORDER BY last_access ASC LIMIT ?)',
+                    (overflow,)
+                ).rowcount
+                self._bump(conn, 'evictions')
+        if removed:
+            logger.info(f"🧹 Match cache evicted {removed} entries")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters aggregated across all processes sharing the file.
+
+        Other workers' counts can lag by up to STATS_FLUSH_INTERVAL seconds.
+        """
+        self._flush_counts(force=True)
+        try:
+            conn = self._conn()
+            counters = dict(conn.execute('SELECT name, value FROM stats').fetchall())
+            entries = conn.execute('SELECT COUNT(*) FROM matches').fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Match cache stats failed: {str(e)}")
+            return {'enabled': True, 'error': str(e)}
+
+        hits = counters.get('hits', 0)
+        negative_hits = counters.get('negative_hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = hits + negative_hits + misses
+        return {
+            'enabled': True,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': hits,
+            'negative_hits': negative_hits,
+            'misses': misses,
+            'evictions': counters.get('evictions', 0),
+            'hit_rate': round((hits + negative_hits) / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,181 @@
+import time
+import random
+import logging
+import threading
+import contextvars
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from matcher import normalize_string
+
+logger = logging.getLogger(__name__)
+
+# Set per HTTP request (and copied into executor threads) so traces can be found by request ID
+current_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('match_request_id', default=None)
+
+
+class MatchTrace:
+    """Scores from one find_best_match call, captured as plain tuples.
+
+    Nothing is formatted while matching; ``to_dict`` and ``log`` do that
+    later, only for traces someone asks for or that were sampled.
+    """
+
+    __slots__ = ('request_id', 'label', 'title', 'artist', 'duration', 'window', 'results',
+                 'candidates', 'exact', 'match', 'score', 'elapsed', 'started_at', 'sampled')
+
+    def __init__(self, request_id: Optional[str], label: str, title: str, artist: str,
+                 duration: Optional[float], window: int, sampled: bool):
+        self.request_id = request_id
+        self.label = label
+        self.title = title
+        self.artist = artist
+        self.duration = duration
+        self.window = window
+        self.results = 0
+        # (result index, candidate, title sim, artist sim, combined): all three None when
+        # pruned by the score bound, only the sims None for an exact-match early exit
+        self.candidates: List[tuple] = []
+        self.exact: Optional[int] = None
+        self.match: Optional[Dict] = None
+        self.score = 0.0
+        self.elapsed = 0.0
+        self.started_at = time.time()
+        self.sampled = sampled
+
+    def scored(self, index: int, candidate: Any, title_similarity: float, artist_similarity: float,
+               combined_score: float) -> None:
+        self.candidates.append((index, candidate, title_similarity, artist_similarity, combined_score))
+
+    def pruned(self, index: int, candidate: Any) -> None:
+        self.candidates.append((index, candidate, None, None, None))
+
+    def exact_match(self, index: int, candidate: Any, score: float) -> None:
+        self.exact = index
+        self.candidates.append((index, candidate, None, None, score))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'requestId': self.request_id,
+            'label': self.label,
+            'title': self.title,
+            'artist': self.artist,
+            'duration': self.duration,
+            'window': self.window,
+            'results': self.results,
+            'exactMatch': self.exact is not None,
+            'match': {
+                'videoId': self.match.get('videoId'),
+                'title': self.match.get('title')
+            } if self.match else None,
+            'score': round(self.score, 4),
+            'elapsedMs': round(self.elapsed * 1000, 3),
+            'timestamp': self.started_at,
+            'candidates': [
+                {
+                    'index': index + 1,
+                    'videoId': candidate.result.get('videoId'),
+                    'title': candidate.title,
+                    'artist': candidate.artist,
+                    'duration': candidate.duration,
+                    'titleSimilarity': round(title_sim, 4) if title_sim is not None else None,
+                    'artistSimilarity': round(artist_sim, 4) if artist_sim is not None else None,
+                    'score': round(combined, 4) if combined is not None else None,
+                    'pruned': combined is None
+                }
+                for index, candidate, title_sim, artist_sim, combined in self.candidates
+            ]
+        }
+
+    def log(self, level: int) -> None:
+        logger.log(level, f"🧭 Match trace {self.request_id or '-'} [{self.label}] '{self.title}' by '{self.artist}': "
+                          f"{len(self.candidates)}/{self.results} candidates, best {self.score:.3f}"
+                          f"{' (exact)' if self.exact is not None else ''} in {self.elapsed * 1000:.2f}ms")
+        for index, candidate, title_sim, artist_sim, combined in self.candidates:
+            if combined is None:
+                logger.log(level, f"   {index + 1}. '{candidate.title}' by '{candidate.artist}': pruned")
+            elif title_sim is None:
+                logger.log(level, f"   {index + 1}. '{candidate.title}' by '{candidate.artist}': exact match")
+            else:
+                logger.log(level, f"   {index + 1}. '{candidate.title}' by '{candidate.artist}': "
+                                  f"title {title_sim:.3f}, artist {artist_sim:.3f}, combined {combined:.3f}")
+
+
+class MatchTracer:
+    """Bounded ring buffer of recent match traces, with sampled logging.
+
+    Every traced call is kept (the oldest fall off after ``capacity``);
+    a trace is written to the log only when DEBUG is enabled for this
+    module or it was picked by ``sample_rate``.
+    """
+
+    def __init__(self, capacity: int, sample_rate: float):
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self._traces: deque = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.logged = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def start(self, title: str, artist: str, duration: Optional[float] = None, window: int = 0,
+              label: str = 'primary', force: bool = False) -> Optional[MatchTrace]:
+        if not (self.enabled or force):
+            return None
+        sampled = force or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        return MatchTrace(current_request_id.get(), label, title, artist, duration, window, sampled)
+
+    def finish(self, trace: Optional[MatchTrace], match: Optional[Dict], score: float, elapsed: float) -> None:
+        if trace is None:
+            return
+        trace.match = match
+        trace.score = score
+        trace.elapsed = elapsed
+        with self._lock:
+            self._traces.append(trace)
+            self.recorded += 1
+        if logger.isEnabledFor(logging.DEBUG):
+            trace.log(logging.DEBUG)
+            self.logged += 1
+        elif trace.sampled:
+            trace.log(logging.INFO)
+            self.logged += 1
+
+    def find(self, request_id: Optional[str] = None, title: str = '', artist: str = '',
+             query: str = '', limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent traces first, by request ID or by (normalized) title/artist/query text"""
+        norm_title, norm_artist, norm_query = normalize_string(title), normalize_string(artist), normalize_string(query)
+        with self._lock:
+            traces = list(self._traces)
+        found = []
+        for trace in reversed(traces):
+            if request_id:
+                if trace.request_id != request_id:
+                    continue
+            else:
+                trace_title, trace_artist = normalize_string(trace.title), normalize_string(trace.artist)
+                if norm_title and norm_title != trace_title:
+                    continue
+                if norm_artist and norm_artist != trace_artist:
+                    continue
+                if norm_query and norm_query not in f'{trace_title} {trace_artist}':
+                    continue
+            found.append(trace.to_dict())
+            if len(found) >= limit:
+                break
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buffered = len(self._traces)
+        return {
+            'enabled': self.enabled,
+            'capacity': self.capacity,
+            'sample_rate': self.sample_rate,
+            'buffered': buffered,
+            'recorded': self.recorded,
+            'logged': self.logged
+        }
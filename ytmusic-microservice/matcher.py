@@ -0,0 +1,357 @@
+import os
+import re
+import logging
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+logger = logging.getLogger(__name__)
+
+# Scoring weights and threshold used by find_best_match
+TITLE_WEIGHT = 0.75
+ARTIST_WEIGHT = 0.25
+EXACT_TITLE_BONUS = 0.1
+MATCH_THRESHOLD = 0.3
+# Score of an exact normalized title + artist match; nothing can beat it
+EXACT_MATCH_SCORE = TITLE_WEIGHT + ARTIST_WEIGHT + EXACT_TITLE_BONUS
+
+# Results further than this from the source duration are only scored as a last resort
+DURATION_TOLERANCE = float(os.getenv('MATCH_DURATION_TOLERANCE', '15'))
+
+_STRIP_PATTERN = re.compile(r'[^\w\s\-\'\&]')
+
+# Title decorations that often keep a track from matching: "Song - Remastered 2011",
+# "Song (feat. X)", "Song [Radio Edit]"
+_DASH_SUFFIX = re.compile(r'\s+-\s+.*$')
+_BRACKETED_DECORATION = re.compile(
+    r'\s*[\(\[][^\)\]]*\b(feat|ft|featuring|with|remaster|remastered|version|edit|mono|stereo|'
+    r'deluxe|bonus|explicit|clean|from|anniversary|single)\b[^\)\]]*[\)\]]',
+    re.IGNORECASE
+)
+_BARE_FEATURING = re.compile(r'\s+(feat\.?|ft\.?|featuring)\s+.*$', re.IGNORECASE)
+
+
+class DifflibBackend:
+    """SequenceMatcher ratio, identical to the original scoring.
+
+    Before running the quadratic ``ratio()`` it checks the character-bag
+    upper bounds (``real_quick_ratio``/``quick_ratio``) and gives up early
+    when the caller says the bound can't win anyway.
+    """
+
+    name = 'difflib'
+
+    def ratio(self, a: str, b: str, beats: Optional[Callable[[float], bool]] = None) -> Optional[float]:
+        sm = SequenceMatcher(None, a, b)
+        if beats is not None and not (beats(sm.real_quick_ratio()) and beats(sm.quick_ratio())):
+            return None
+        return sm.ratio()
+
+
+class RapidfuzzBackend:
+    """C-accelerated Indel ratio from rapidfuzz.
+
+    Scores are close to, but not always identical with, SequenceMatcher,
+    so this backend is opt-in via MATCHER_BACKEND=rapidfuzz.
+    """
+
+    name = 'rapidfuzz'
+
+    def __init__(self):
+        from rapidfuzz.fuzz import ratio
+        self._ratio = ratio
+
+    def ratio(self, a: str, b: str, beats: Optional[Callable[[float], bool]] = None) -> Optional[float]:
+        score = self._ratio(a, b) / 100.0
+        if beats is not None and not beats(score):
+            return None
+        return score
+
+
+def _load_backend(name: str):
+    if name == 'rapidfuzz':
+        try:
+            return RapidfuzzBackend()
+        except ImportError:
+            logger.warning("⚠️ rapidfuzz not installed, falling back to difflib matcher")
+    return DifflibBackend()
+
+
+backend = _load_backend(os.getenv('MATCHER_BACKEND', 'difflib').lower())
+
+
+@lru_cache(maxsize=16384)
+def normalize_string(s: str) -> str:
+    """Normalize string for better matching - less aggressive normalization"""
+    # Keep some punctuation that might be important for matching
+    s = _STRIP_PATTERN.sub('', s.lower().strip())
+    # Remove extra whitespace
+    s = ' '.join(s.split())
+    return s
+
+def calculate_similarity(str1: str, str2: str) -> float:
+    """Calculate similarity between two strings"""
+    return backend.ratio(normalize_string(str1), normalize_string(str2))
+
+def strip_title_decorations(title: str) -> str:
+    """Title without remaster/featuring/edit suffixes (unchanged if that would leave nothing)"""
+    stripped = _BRACKETED_DECORATION.sub('', title)
+    stripped = _DASH_SUFFIX.sub('', stripped)
+    stripped = _BARE_FEATURING.sub('', stripped).strip()
+    return stripped or title.strip()
+
+def fallback_queries(title: str, artist: str) -> List[Tuple[str, str, str]]:
+    """Alternative ``(label, query, title_to_score)`` searches for a track that didn't match.
+
+    Variants: decorations stripped, primary artist only, and title only.
+    Duplicates of each other and of the original query are dropped.
+    """
+    stripped = strip_title_decorations(title)
+    primary_artist = artist.split(',')[0].strip()
+
+    variants = [
+        ('stripped', f"{stripped} {primary_artist}".strip(), stripped),
+        ('primary_artist', f"{title} {primary_artist}".strip(), title),
+        ('title_only', stripped, stripped),
+    ]
+
+    seen = {normalize_string(f"{title} {artist}")}
+    queries = []
+    for label, query, match_title in variants:
+        key = normalize_string(query)
+        if key and key not in seen:
+            seen.add(key)
+            queries.append((label, query, match_title))
+    return queries
+
+def parse_duration(value: Any) -> Optional[float]:
+    """Seconds from a number of seconds or a "m:ss" / "h:mm:ss" string"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+    try:
+        seconds = 0.0
+        for part in str(value).split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds if seconds > 0 else None
+    except ValueError:
+        return None
+
+
+class MatchQuery:
+    """Query side of a match, normalized once and reused for every candidate"""
+
+    __slots__ = ('title', 'artist', 'norm_title', 'norm_artist', 'norm_artists', 'tokens', 'duration', '_pair_scores')
+
+    def __init__(self, title: str, artist: str, duration: Optional[float] = None):
+        self.title = title
+        self.artist = artist
+        self.norm_title = normalize_string(title)
+        self.norm_artist = normalize_string(artist)
+        self.norm_artists = [normalize_string(a.strip()) for a in artist.split(',')]
+        self.tokens = set(self.norm_title.split()) | set(self.norm_artist.split())
+        self.duration = duration
+        # Result artists repeat across candidates, so remember pair scores
+        self._pair_scores: Dict[str, float] = {}
+
+    def best_artist_pair(self, norm_name: str) -> float:
+        """Best similarity between any query artist and one result artist"""
+        score = self._pair_scores.get(norm_name)
+        if score is None:
+            score = max(backend.ratio(qa, norm_name) for qa in self.norm_artists)
+            self._pair_scores[norm_name] = score
+        return score
+
+
+class Candidate:
+    """Features of one search result, computed once"""
+
+    __slots__ = ('result', 'title', 'artist_names', 'artist', 'norm_title', 'norm_artist', 'norm_artist_names', 'duration')
+
+    def __init__(self, result: Dict):
+        self.result = result
+        self.title = result.get('title', '').strip()
+
+        artist_names = []
+        for artist in result.get('artists', []):
+            if isinstance(artist, dict):
+                name = artist.get('name', '')
+                if name:
+                    artist_names.append(name)
+            elif isinstance(artist, str):
+                artist_names.append(artist)
+
+        self.artist_names = artist_names
+        self.artist = ', '.join(artist_names)
+        self.norm_title = normalize_string(self.title)
+        self.norm_artist = normalize_string(self.artist)
+        self.norm_artist_names = [normalize_string(name) for name in artist_names]
+        self.duration = parse_duration(result.get('duration_seconds') or result.get('duration'))
+
+    def token_overlap(self, query: 'MatchQuery') -> int:
+        return len(query.tokens.intersection(self.norm_title.split() + self.norm_artist.split()))
+
+    def duration_matches(self, query: 'MatchQuery') -> bool:
+        if query.duration is None or self.duration is None:
+            return True
+        return abs(query.duration - self.duration) <= DURATION_TOLERANCE
+
+    def is_exact(self, query: 'MatchQuery') -> bool:
+        """Same normalized title and artist: scores EXACT_MATCH_SCORE"""
+        return self.norm_title == query.norm_title and (
+            self.norm_artist == query.norm_artist
+            or any(name in query.norm_artists for name in self.norm_artist_names)
+        )
+
+
+def _artist_similarity(query: MatchQuery, candidate: Candidate) -> float:
+    """Whole-string artist similarity, or the best single-artist pair if higher"""
+    artist_similarity = backend.ratio(query.norm_artist, candidate.norm_artist)
+    for norm_name in candidate.norm_artist_names:
+        if artist_similarity >= 1.0:
+            break
+        artist_similarity = max(artist_similarity, query.best_artist_pair(norm_name))
+    return artist_similarity
+
+def artist_similarity(query_artist: str, result: Dict) -> float:
+    """Artist similarity between a source artist string and one search result"""
+    return _artist_similarity(MatchQuery('', query_artist), Candidate(result))
+
+def score_candidate(query: MatchQuery, candidate: Candidate, floor: float = -1.0) -> Optional[Tuple[float, float, float]]:
+    """Score one candidate as (title_sim, artist_sim, combined).
+
+    Returns None when the candidate provably cannot score above ``floor``;
+    otherwise the scores equal the original per-pair computation.
+    """
+    bonus = EXACT_TITLE_BONUS if query.norm_title == candidate.norm_title else 0.0
+
+    title_similarity = backend.ratio(
+        query.norm_title, candidate.norm_title,
+        lambda bound: (bound * TITLE_WEIGHT) + ARTIST_WEIGHT + bonus > floor
+    )
+    if title_similarity is None:
+        return None
+
+    artist_similarity = _artist_similarity(query, candidate)
+
+    combined_score = (title_similarity * TITLE_WEIGHT) + (artist_similarity * ARTIST_WEIGHT) + bonus
+    return title_similarity, artist_similarity, combined_score
+
+def rank_results(query_title: str, query_artist: str, results: List[Dict],
+                 duration: Optional[float] = None, window: int = 0,
+                 trace: Optional[Any] = None) -> Tuple[Optional[Dict], float]:
+    """Return the highest scoring result and its score (first one wins ties).
+
+    Two stages. A cheap pre-filter returns the first exact normalized
+    title + artist match within the duration tolerance right away (no
+    other result can outscore it), and defers results that share no token
+    with the query or whose duration is off. Full scoring then runs in
+    tiers: the first ``window`` results (all when 0), the rest of the
+    page, and finally the deferred ones, each tier only while nothing has
+    cleared MATCH_THRESHOLD.
+
+    Per-candidate scores go to ``trace`` (a match_trace.MatchTrace) when
+    given, and to the log only at DEBUG.
+    """
+    query = MatchQuery(query_title, query_artist, duration)
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if trace is not None:
+        trace.results = len(results)
+
+    preferred = []
+    deferred = []
+    for i, result in enumerate(results):
+        try:
+            candidate = Candidate(result)
+            if not candidate.title:
+                continue
+            duration_ok = candidate.duration_matches(query)
+            if duration_ok and candidate.is_exact(query):
+                if trace is not None:
+                    trace.exact_match(i, candidate, EXACT_MATCH_SCORE)
+                if debug:
+                    logger.debug(f"🎯 Result {i+1}: exact match '{candidate.title}' by '{candidate.artist}'")
+                return result, EXACT_MATCH_SCORE
+            overlap = candidate.token_overlap(query)
+            if duration_ok and overlap:
+                preferred.append((i, overlap, candidate))
+            else:
+                deferred.append((i, overlap, candidate))
+        except Exception as e:
+            logger.error(f"❌ Error processing search result: {str(e)}")
+            continue
+
+    if window:
+        tiers = [[c for c in preferred if c[0] < window], [c for c in preferred if c[0] >= window], deferred]
+    else:
+        tiers = [preferred, deferred]
+
+    best_match = None
+    best_score = 0.0
+    best_index = -1
+
+    for tier in tiers:
+        if best_score >= MATCH_THRESHOLD:
+            break
+        # Likely winners first, so the bound check prunes more of the rest
+        for i, _, candidate in sorted(tier, key=lambda c: (-c[1], c[0])):
+            try:
+                scores = score_candidate(query, candidate, best_score)
+                if scores is None:
+                    if trace is not None:
+                        trace.pruned(i, candidate)
+                    if debug:
+                        logger.debug(f"⏭️ Result {i+1}: '{candidate.title}' cannot beat {best_score:.3f}, skipped")
+                    continue
+
+                title_similarity, artist_similarity, combined_score = scores
+
+                if trace is not None:
+                    trace.scored(i, candidate, title_similarity, artist_similarity, combined_score)
+                if debug:
+                    logger.debug(f"🔍 Result {i+1}: '{candidate.title}' by '{candidate.artist}' - "
+                                 f"title sim {title_similarity:.3f}, artist sim {artist_similarity:.3f}, combined {combined_score:.3f}")
+
+                if combined_score > best_score or (combined_score == best_score and i < best_index):
+                    best_score = combined_score
+                    best_match = candidate.result
+                    best_index = i
+
+            except Exception as e:
+                logger.error(f"❌ Error processing search result: {str(e)}")
+                continue
+
+    return best_match, best_score
+
+def find_best_match(query_title: str, query_artist: str, results: List[Dict],
+                    duration: Optional[float] = None, window: int = 0,
+                    observe: Optional[Callable[[float], None]] = None,
+                    trace: Optional[Any] = None) -> Optional[Dict]:
+    """Find the best matching track from search results using improved similarity scoring.
+
+    ``observe``, when given, is called with the best score of the page;
+    ``trace`` collects the per-candidate scores (see rank_results).
+    """
+    if not results:
+        return None
+
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug(f"🔍 Finding best match for: '{query_title}' by '{query_artist}'")
+
+    best_match, best_score = rank_results(query_title, query_artist, results, duration, window, trace)
+    if observe:
+        observe(best_score)
+
+    # Lower threshold for better matching (0.3 instead of 0.4)
+    if best_score >= MATCH_THRESHOLD and best_match:
+        if debug:
+            match_title = best_match.get('title', 'Unknown')
+            match_artists = ', '.join([a.get('name', '') if isinstance(a, dict) else str(a) for a in best_match.get('artists', [])])
+            logger.debug(f"✅ Best match found with score {best_score:.3f}: '{match_title}' by '{match_artists}'")
+        return best_match
+    else:
+        if debug:
+            logger.debug(f"❌ No match above threshold {MATCH_THRESHOLD} (best score: {best_score:.3f})")
+        return None
@@ -0,0 +1,103 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+    logger.warning("⚠️ prometheus_client not installed, /metrics is disabled. Run: pip install prometheus-client")
+
+# Set by gunicorn.conf.py; every worker then writes its samples to files
+# in this directory and /metrics sums them, whichever worker serves it
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR') or os.getenv('prometheus_multiproc_dir')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SCORING_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+SCORE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1)
+
+
+class _NoopMetric:
+    """Stands in for a metric when prometheus_client is missing"""
+
+    def labels(self, *args, **kwargs) -> '_NoopMetric':
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+def _histogram(name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> Any:
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Histogram(name, documentation, labelnames, buckets=buckets)
+
+
+def _counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Any:
+    if not PROMETHEUS_AVAILABLE:
+        return _NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+HTTP_REQUEST_SECONDS = _histogram(
+    'ytmusic_http_request_seconds', 'Request latency by endpoint', ('endpoint', 'method', 'status'))
+UPSTREAM_CALL_SECONDS = _histogram(
+    'ytmusic_upstream_call_seconds',
+    'YTMusic API call latency, including client pool checkout but not rate limiter token waits',
+    ('method', 'outcome'))
+SEARCH_SECONDS = _histogram(
+    'ytmusic_search_seconds', 'ytmusic.search latency with hedging, deadline and circuit breaker', ('outcome',))
+MATCH_SCORING_SECONDS = _histogram(
+    'ytmusic_match_scoring_seconds', 'find_best_match scoring time for one result page', buckets=SCORING_BUCKETS)
+MATCH_SCORE = _histogram(
+    'ytmusic_match_best_score', 'Best combined score per scored result page', buckets=SCORE_BUCKETS)
+MATCH_OUTCOMES = _counter(
+    'ytmusic_match_outcomes', 'Upstream match results: matched, fallback, unmatched or error', ('outcome',))
+CACHE_LOOKUPS = _counter(
+    'ytmusic_match_cache_lookups', 'Match cache lookups by tier and result', ('tier', 'result'))
+CREATE_PLAYLIST_SECONDS = _histogram(
+    'ytmusic_create_playlist_seconds', 'Playlist creation time including all tracks', ('mode', 'outcome'))
+FIRESTORE_READ_SECONDS = _histogram(
+    'ytmusic_firestore_read_seconds', 'Firestore read latency', ('operation', 'outcome'))
+TOKEN_REFRESH_SECONDS = _histogram(
+    'ytmusic_token_refresh_seconds', 'OAuth token refresh latency', ('outcome',))
+
+
+@contextmanager
+def timer(histogram: Any, **labels: str) -> Iterator[None]:
+    """Observe the block's duration, labelled ``outcome=ok|error`` when the histogram has that label"""
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except Exception:
+        outcome = 'error'
+        raise
+    finally:
+        labelnames = getattr(histogram, '_labelnames', ())
+        if 'outcome' in labelnames:
+            labels['outcome'] = outcome
+        metric = histogram.labels(**labels) if labelnames else histogram
+        metric.observe(time.perf_counter() - started)
+
+
+def render() -> Tuple[Optional[bytes], str]:
+    """Exposition-format payload for /metrics, or None when prometheus_client is missing"""
+    if not PROMETHEUS_AVAILABLE:
+        return None, CONTENT_TYPE_LATEST
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BuildCancelled(Exception):
+    """Raised between chunks when the conversion was cancelled; the checkpoint is kept"""
+
+
+def fingerprint(video_ids: List[str]) -> str:
+    return hashlib.sha1('\n'.join(video_ids).encode('utf-8')).hexdigest()
+
+
+class FileCheckpointStore:
+    """Build checkpoints as JSON files, one per build key"""
+
+    def __init__(self, directory: str, ttl: float):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._prune(ttl)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _prune(self, ttl: float) -> None:
+        cutoff = time.time() - ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, key: str, state: Dict[str, Any]) -> None:
+        fd, tmp_path = tempfile.mkstemp(prefix='.build-', suffix='.json', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+class FirestoreCheckpointStore:
+    """Build checkpoints as Firestore documents, shared by every worker and instance.
+
+    Each document carries an ``expiresAt`` timestamp ``ttl`` seconds after
+    its last save; expired ones are ignored (and deleted) on load. Point a
+    Firestore TTL policy at ``expiresAt`` so untouched ones are removed too.
+    """
+
+    def __init__(self, db: Any, ttl: float, collection: str = 'playlist-builds'):
+        self.db = db
+        self.ttl = ttl
+        self.collection = collection
+
+    def _ref(self, key: str):
+        return self.db.collection(self.collection).document(hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        ref = self._ref(key)
+        with metrics.timer(metrics.FIRESTORE_READ_SECONDS, operation='checkpoint_get'):
+            doc = ref.get()
+        if not doc.exists:
+            return None
+        state = doc.to_dict()
+        expires_at = state.pop('expiresAt', None)
+        if isinstance(expires_at, datetime):
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at <= datetime.now(timezone.utc):
+                try:
+                    ref.delete()
+                except Exception as e:
+                    logger.warning(f"⚠️ Deleting expired checkpoint {key} failed: {str(e)}")
+                return None
+        return state
+
+    def save(self, key: str, state: Dict[str, Any]) -> None:
+        self._ref(key).set({**state, 'expiresAt': datetime.now(timezone.utc) + timedelta(seconds=self.ttl)})
+
+
+class PlaylistBuilder:
+    """Creates a playlist, then adds tracks in chunks with a checkpoint after each.
+
+    The checkpoint records the playlist ID, the next chunk offset and the
+    per-chunk counts, so calling ``build`` again with the same key and the
+    same track list resumes where the last attempt stopped instead of
+    creating a second playlist. Items are added with YouTube Music's
+    dedupe-skip option, so replaying a chunk that landed just before a
+    crash doesn't add duplicates. With no ``store`` nothing is checkpointed
+    and every build starts a new playlist.
+    """
+
+    def __init__(self, call: Callable[..., Any], store: Any, chunk_size: int,
+                 chunk_retries: int, retry_delay: float = 1.0):
+        self.call = call
+        self.store = store
+        self.chunk_size = chunk_size
+        self.chunk_retries = chunk_retries
+        self.retry_delay = retry_delay
+
+    def create(self, title: str, description: str) -> str:
+        """Create an empty UNLISTED playlist and return its ID"""
+        playlist_result = self.call('create_playlist', title, description, privacy_status='UNLISTED')
+        if isinstance(playlist_result, dict):
+            raise Exception(f'Playlist creation returned error: {playlist_result}')
+        playlist_id = str(playlist_result).strip()
+        if not playlist_id:
+            raise Exception('Failed to create playlist - empty ID returned')
+        return playlist_id
+
+    def _add_chunk(self, playlist_id: str, chunk: List[str]) -> int:
+        """Add one chunk, returning how many items YouTube Music actually added"""
+        last_error: Optional[Exception] = None
+        for attempt in range(self.chunk_retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay * attempt)
+            try:
+                response = self.call('add_playlist_items', playlist_id, chunk, duplicates=True)
+                status = response.get('status', '') if isinstance(response, dict) else str(response)
+                if 'SUCCEEDED' not in status:
+                    raise Exception(f'add_playlist_items returned {response}')
+                results = response.get('playlistEditResults') if isinstance(response, dict) else None
+                if results is None:
+                    return len(chunk)
+                return sum(1 for result in results if result)
+            except Exception as e:
+                last_error = e
+                logger.warning(f"⚠️ Adding {len(chunk)} tracks to {playlist_id} failed (attempt {attempt + 1}): {str(e)}")
+        raise last_error
+
+    def add_items(self, playlist_id: str, video_ids: List[str]) -> Dict[str, Any]:
+        """Add tracks to an existing playlist in chunks (no checkpoint)"""
+        added = 0
+        failed: List[str] = []
+        for start in range(0, len(video_ids), self.chunk_size):
+            chunk = video_ids[start:start + self.chunk_size]
+            try:
+                added += self._add_chunk(playlist_id, chunk)
+            except Exception as e:
+                logger.error(f"❌ Giving up on {len(chunk)} tracks for {playlist_id}: {str(e)}")
+                failed += chunk
+        return {'added': added, 'skipped': len(video_ids) - added - len(failed), 'failedVideoIds': failed}
+
+    def remove_items(self, playlist_id: str, tracks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Remove playlist entries (each needs ``videoId`` and ``setVideoId``) in chunks"""
+        removed = 0
+        failed: List[str] = []
+        for start in range(0, len(tracks), self.chunk_size):
+            chunk = [
+                {'videoId': track['videoId'], 'setVideoId': track['setVideoId']}
+                for track in tracks[start:start + self.chunk_size]
+            ]
+            try:
+                response = self.call('remove_playlist_items', playlist_id, chunk)
+                status = response.get('status', '') if isinstance(response, dict) else str(response)
+                if 'SUCCEEDED' not in status:
+                    raise Exception(f'remove_playlist_items returned {response}')
+                removed += len(chunk)
+            except Exception as e:
+                logger.error(f"❌ Removing {len(chunk)} tracks from {playlist_id} failed: {str(e)}")
+                failed += [track['videoId'] for track in chunk]
+        return {'removed': removed, 'failedVideoIds': failed}
+
+    def build(self, key: str, title: str, description: str, video_ids: List[str],
+              should_stop: Callable[[], bool] = lambda: False) -> Dict[str, Any]:
+        list_fingerprint = fingerprint(video_ids)
+        state = self.store.load(key) if self.store else None
+        if state and state.get('fingerprint') != list_fingerprint:
+            logger.warning(f"⚠️ Track list changed for build {key}, starting a new playlist")
+            state = None
+
+        resumed = state is not None
+        if state and state.get('completed'):
+            logger.info(f"ℹ️ Build {key} already completed: {state['playlistId']}")
+            return self._result(state, title, description, resumed)
+
+        if not state:
+            state = {
+                'fingerprint': list_fingerprint,
+                'playlistId': self.create(title, description),
+                'total': len(video_ids),
+                'nextIndex': 0,
+                'added': 0,
+                'skipped': 0,
+                'failedVideoIds': [],
+                'chunks': 0,
+                'completed': False
+            }
+            self._checkpoint(key, state)
+            logger.info(f"📋 Created playlist {state['playlistId']}, adding {len(video_ids)} tracks in chunks of {self.chunk_size}")
+        else:
+            logger.info(f"🔁 Resuming build {key} on {state['playlistId']} at track {state['nextIndex']}/{len(video_ids)}")
+
+        # Chunks that failed on an earlier attempt get another try first
+        retry_ids, state['failedVideoIds'] = state['failedVideoIds'], []
+        pending = [(None, retry_ids[i:i + self.chunk_size]) for i in range(0, len(retry_ids), self.chunk_size)]
+        pending += [
+            (start, video_ids[start:start + self.chunk_size])
+            for start in range(state['nextIndex'], len(video_ids), self.chunk_size)
+        ]
+
+        for position, (start, chunk) in enumerate(pending):
+            if should_stop():
+                # Retries not reached yet stay queued for the next attempt
+                for remaining_start, remaining in pending[position:]:
+                    if remaining_start is None:
+                        state['failedVideoIds'] += remaining
+                self._checkpoint(key, state)
+                raise BuildCancelled()
+            try:
+                added = self._add_chunk(state['playlistId'], chunk)
+                state['added'] += added
+                state['skipped'] += len(chunk) - added
+            except Exception as e:
+                logger.error(f"❌ Giving up on {len(chunk)} tracks for {state['playlistId']}: {str(e)}")
+                state['failedVideoIds'] += chunk
+            if start is not None:
+                state['nextIndex'] = start + len(chunk)
+            state['chunks'] += 1
+            self._checkpoint(key, state)
+
+        # With failed chunks left, the next call for this key retries them
+        state['completed'] = not state['failedVideoIds']
+        self._checkpoint(key, state)
+        return self._result(state, title, description, resumed)
+
+    def _checkpoint(self, key: str, state: Dict[str, Any]) -> None:
+        state['updatedAt'] = datetime.now().isoformat()
+        if not self.store:
+            return
+        try:
+            self.store.save(key, state)
+        except Exception as e:
+            # Losing a checkpoint only costs resumability, not the build itself
+            logger.warning(f"⚠️ Checkpoint for build {key} failed: {str(e)}")
+
+    @staticmethod
+    def _result(state: Dict[str, Any], title: str, description: str, resumed: bool) -> Dict[str, Any]:
+        return {
+            'playlistId': state['playlistId'],
+            'title': title,
+            'description': description,
+            'url': f"https://music.youtube.com/playlist?list={state['playlistId']}",
+            'tracksAdded': state['added'],
+            'tracksSkipped': state['skipped'],
+            'tracksFailed': len(state['failedVideoIds']),
+            'failedVideoIds': state['failedVideoIds'],
+            'chunks': state['chunks'],
+            'resumed': resumed
+        }
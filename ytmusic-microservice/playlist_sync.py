@@ -0,0 +1,182 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from matcher import MATCH_THRESHOLD, MatchQuery, Candidate, score_candidate
+
+logger = logging.getLogger(__name__)
+
+
+class SyncPlan:
+    """How the current source tracks line up with an existing playlist.
+
+    ``kept`` maps source indexes to the playlist entry they already have,
+    ``unresolved`` lists source indexes that still need a search, and
+    ``extra()`` returns playlist entries no source track claimed. Search
+    outcomes for the unresolved tracks are folded in with ``record_search``.
+    """
+
+    def __init__(self, index: 'TargetIndex', min_artist: float = 0.0):
+        self.index = index
+        self.min_artist = min_artist
+        # Source queries of the unresolved tracks, to protect their possible entries from removal
+        self.queries: Dict[int, MatchQuery] = {}
+        self.kept: Dict[int, Dict[str, Any]] = {}
+        self.unresolved: List[int] = []
+        self.resolved_by = {'cache': 0, 'title': 0, 'fuzzy': 0, 'search': 0}
+        # (source index, videoId) of searched matches not in the playlist yet
+        self.to_add: List[tuple] = []
+        # Source indexes whose search failed (or was incomplete), so whether they are present is unknown
+        self.failed: List[int] = []
+        # Source indexes the search found nothing for
+        self.not_found: List[int] = []
+        # Unclaimed entries kept because a not-found source track may be them
+        self.protected: List[Dict[str, Any]] = []
+
+    def claim_searched(self, source_index: int, video_id: Optional[str]) -> bool:
+        """Record a searched match that turned out to be in the playlist already"""
+        kept = self.index.claim_video_id(video_id)
+        if kept:
+            self.kept[source_index] = kept
+            self.resolved_by['search'] += 1
+        return kept is not None
+
+    def record_search(self, source_index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Fold in one search outcome (``success``, ``result``, ``error``, ``transient``) and return the track's status"""
+        if not item['success']:
+            self.failed.append(source_index)
+            return {'index': source_index, 'status': 'error', 'error': item.get('error')}
+        if item.get('transient'):
+            # "Nothing found" only because some of its queries failed
+            self.failed.append(source_index)
+            return {'index': source_index, 'status': 'error', 'error': 'Search incomplete: some queries failed'}
+        if not item['result']:
+            self.not_found.append(source_index)
+            return {'index': source_index, 'status': 'not_found'}
+        video_id = item['result']['videoId']
+        if self.claim_searched(source_index, video_id):
+            return {'index': source_index, 'status': 'kept', 'videoId': video_id}
+        self.to_add.append((source_index, video_id))
+        return {'index': source_index, 'status': 'to_add', 'videoId': video_id}
+
+    def extra(self) -> List[Dict[str, Any]]:
+        return [entry['track'] for entry in self.index.unclaimed()]
+
+    def removals(self) -> List[Dict[str, Any]]:
+        """Removable playlist entries no source track claimed.
+
+        Empty while any search failed: the failed track's entry would be
+        unclaimed too, and removing it would delete a track that is still
+        in the source. Entries that a not-found source track plausibly
+        matches (search threshold, same artist floor as local matching)
+        are kept too, and listed in ``protected``.
+        """
+        if self.failed:
+            return []
+        removals = []
+        self.protected = []
+        missing = [self.queries[i] for i in self.not_found if i in self.queries]
+        for entry in self.index.unclaimed():
+            if not entry['track'].get('setVideoId'):
+                continue
+            if any(self._plausible(query, entry['candidate']) for query in missing):
+                self.protected.append(entry['track'])
+            else:
+                removals.append(entry['track'])
+        return removals
+
+    def _plausible(self, query: MatchQuery, candidate: Candidate) -> bool:
+        scores = score_candidate(query, candidate, MATCH_THRESHOLD - 1e-9)
+        return scores is not None and scores[2] >= MATCH_THRESHOLD and scores[1] >= self.min_artist
+
+
+class TargetIndex:
+    """Unclaimed entries of the target playlist, looked up by videoId or normalized title"""
+
+    def __init__(self, tracks: List[Dict[str, Any]]):
+        self.entries = [
+            {'track': track, 'candidate': Candidate(track), 'claimed': False}
+            for track in tracks if track.get('videoId')
+        ]
+        self.by_video_id: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_title: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in self.entries:
+            self.by_video_id.setdefault(entry['track']['videoId'], []).append(entry)
+            self.by_title.setdefault(entry['candidate'].norm_title, []).append(entry)
+
+    def claim_video_id(self, video_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        for entry in self.by_video_id.get(video_id or '', []):
+            if not entry['claimed']:
+                entry['claimed'] = True
+                return entry['track']
+        return None
+
+    def unclaimed(self) -> List[Dict[str, Any]]:
+        return [entry for entry in self.entries if not entry['claimed']]
+
+
+def _claim_best(query: MatchQuery, entries: List[Dict[str, Any]], threshold: float,
+                min_artist: float) -> Optional[Dict[str, Any]]:
+    best_entry = None
+    best_score = threshold
+    for entry in entries:
+        if entry['claimed']:
+            continue
+        # Floor just under the best so far: a candidate at exactly the threshold still counts
+        scores = score_candidate(query, entry['candidate'], best_score - 1e-9)
+        if scores is not None and scores[2] >= best_score and scores[1] >= min_artist:
+            best_entry, best_score = entry, scores[2]
+    if best_entry:
+        best_entry['claimed'] = True
+        return best_entry['track']
+    return None
+
+
+def plan_sync(source_tracks: List[Dict[str, Any]], target_tracks: List[Dict[str, Any]],
+              cached_video_id: Callable[[Dict[str, Any]], Optional[str]],
+              local_threshold: float, min_artist: float, max_fuzzy_pairs: int) -> SyncPlan:
+    """Match source tracks against the playlist without searching YouTube Music.
+
+    Tries, in order: the cached match's videoId, playlist entries with the
+    same normalized title, then (within ``max_fuzzy_pairs`` comparisons) a
+    fuzzy scan of the remaining entries. Local matches must score at least
+    ``local_threshold`` with an artist similarity of at least ``min_artist``,
+    stricter than the search threshold since a playlist holds many unrelated
+    tracks (a same-titled song by another artist must not count as present).
+    """
+    index = TargetIndex(target_tracks)
+    plan = SyncPlan(index, min_artist)
+    remaining = []
+
+    for i, track in enumerate(source_tracks):
+        kept = index.claim_video_id(cached_video_id(track))
+        if kept:
+            plan.kept[i] = kept
+            plan.resolved_by['cache'] += 1
+        else:
+            remaining.append(i)
+
+    queries = {i: MatchQuery(source_tracks[i].get('title', ''), source_tracks[i].get('artist', '')) for i in remaining}
+
+    still_remaining = []
+    for i in remaining:
+        kept = _claim_best(queries[i], index.by_title.get(queries[i].norm_title, []), local_threshold, min_artist)
+        if kept:
+            plan.kept[i] = kept
+            plan.resolved_by['title'] += 1
+        else:
+            still_remaining.append(i)
+
+    unclaimed = index.unclaimed()
+    if still_remaining and len(still_remaining) * len(unclaimed) <= max_fuzzy_pairs:
+        for i in still_remaining:
+            kept = _claim_best(queries[i], unclaimed, local_threshold, min_artist)
+            if kept:
+                plan.kept[i] = kept
+                plan.resolved_by['fuzzy'] += 1
+            else:
+                plan.unresolved.append(i)
+    else:
+        plan.unresolved = still_remaining
+
+    plan.queries = {i: queries[i] for i in plan.unresolved}
+    return plan
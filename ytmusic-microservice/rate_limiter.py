@@ -0,0 +1,169 @@
+import os
+import re
+import time
+import struct
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to a per-process limiter
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# tokens, updated_at, rate, last_decrease_at, calls, throttle_events
+_STATE = struct.Struct('<dddd qq')
+
+_THROTTLE_PATTERN = re.compile(r'HTTP (429|5\d\d)')
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call could not get a token within the allowed wait"""
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """True for upstream 429/5xx responses, which should slow us down"""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return bool(_THROTTLE_PATTERN.search(str(error)))
+
+
+class AdaptiveRateLimiter:
+    """Token bucket with AIMD rate control, shared across processes.
+
+    The bucket lives in a small binary file guarded by ``flock`` so every
+    gunicorn worker on the host draws from the same budget. Successful
+    calls raise the rate additively; throttling responses (429/5xx) cut
+    it multiplicatively, at most once per ``decrease_cooldown`` seconds so
+    a burst of failures from concurrent calls counts as one event.
+    """
+
+    def __init__(self, path: str, initial_rate: float, min_rate: float, max_rate: float,
+                 burst: float, increase: float, backoff: float,
+                 decrease_cooldown: float = 1.0, max_wait: float = 60.0):
+        self.path = path
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.backoff = backoff
+        self.decrease_cooldown = decrease_cooldown
+        self.max_wait = max_wait
+        self._thread_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Create the state file once; O_EXCL keeps concurrent workers from clobbering it
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_STATE.pack(burst, time.time(), initial_rate, 0.0, 0, 0))
+
+    def _update(self, fn: Callable[[list], Any]) -> Any:
+        """Run ``fn`` on the decoded state under the cross-process lock and persist it"""
+        with self._thread_lock:
+            with open(self.path, 'r+b') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    raw = f.read(_STATE.size)
+                    if len(raw) == _STATE.size:
+                        state = list(_STATE.unpack(raw))
+                    else:
+                        state = [self.burst, time.time(), self.initial_rate, 0.0, 0, 0]
+                    result = fn(state)
+                    f.seek(0)
+                    f.write(_STATE.pack(*state))
+                    f.truncate()
+                    return result
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _take(self, state: list) -> float:
+        """Take one token if available; otherwise return seconds to wait"""
+        now = time.time()
+        tokens, updated_at, rate = state[0], state[1], state[2]
+        tokens = min(self.burst, tokens + max(0.0, now - updated_at) * rate)
+        state[1] = now
+        if tokens >= 1.0:
+            state[0] = tokens - 1.0
+            state[4] += 1
+            return 0.0
+        state[0] = tokens
+        return (1.0 - tokens) / rate
+
+    def acquire(self) -> None:
+        """Block until a token is available"""
+        deadline = time.time() + self.max_wait
+        while True:
+            wait = self._update(self._take)
+            if wait <= 0:
+                return
+            if time.time() + wait > deadline:
+                raise RateLimitTimeout(f'Rate limiter wait exceeded {self.max_wait}s')
+            time.sleep(wait)
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right now"""
+        return self._update(self._take) <= 0
+
+    def on_success(self) -> None:
+        def increase(state):
+            state[2] = min(self.max_rate, state[2] + self.increase)
+        self._update(increase)
+
+    def on_throttle(self) -> None:
+        def decrease(state):
+            now = time.time()
+            state[5] += 1
+            if now - state[3] < self.decrease_cooldown:
+                return state[2]
+            state[2] = max(self.min_rate, state[2] * self.backoff)
+            state[3] = now
+            # Drain the bucket so the next calls wait for the slower rate
+            state[0] = min(state[0], 0.0)
+            return state[2]
+        rate = self._update(decrease)
+        logger.warning(f"⚠️ YouTube Music throttled us, rate now {rate:.2f}/s")
+
+    def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Call ``fn`` under the limiter and feed the outcome back into the rate"""
+        self.acquire()
+        return self.run(fn, *args, **kwargs)
+
+    def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Call ``fn`` with a token already taken and feed the outcome back into the rate"""
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_throttle_error(e):
+                self.on_throttle()
+            raise
+        self.on_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        state = self._update(lambda s: list(s))
+        return {
+            'enabled': True,
+            'shared': fcntl is not None,
+            'rate': round(state[2], 3),
+            'tokens': round(state[0], 3),
+            'min_rate': self.min_rate,
+            'max_rate': self.max_rate,
+            'calls': state[4],
+            'throttle_events': state[5],
+            'last_backoff_at': datetime.fromtimestamp(state[3]).isoformat() if state[3] else None
+        }
+
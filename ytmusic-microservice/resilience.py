@@ -0,0 +1,231 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when an upstream call does not finish within its deadline"""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open"""
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies (seconds)"""
+
+    def __init__(self, size: int = 500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+        return {
+            'samples': len(self),
+            'p50_ms': ms(self.percentile(50)),
+            'p95_ms': ms(self.percentile(95)),
+            'p99_ms': ms(self.percentile(99))
+        }
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures.
+
+    ``failure_threshold`` consecutive failures open the circuit for
+    ``reset_timeout`` seconds. After that a single trial call is let
+    through (half-open); its success closes the circuit, its failure
+    re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.state = 'closed'
+        self.rejected = 0
+        self.trips = 0
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open' and time.time() - self._opened_at >= self.reset_timeout:
+                self.state = 'half-open'
+            if self.state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+        raise CircuitOpenError('YouTube Music is degraded, failing fast')
+
+    def on_success(self) -> None:
+        with self._lock:
+            if self.state != 'closed':
+                logger.info("✅ Circuit breaker closed, YouTube Music recovered")
+            self.state = 'closed'
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def on_abort(self) -> None:
+        """The call never reached upstream: free a half-open trial without judging it"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half-open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.trips += 1
+                    logger.warning(f"⚠️ Circuit breaker opened after {self._failures} failures")
+                self.state = 'open'
+                self._opened_at = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'trips': self.trips,
+                'rejected': self.rejected
+            }
+
+
+class HedgedCaller:
+    """Run upstream calls with a deadline and optional request hedging.
+
+    When hedging is on and the first attempt hasn't returned after the
+    tracked ``hedge_percentile`` latency (never less than ``min_hedge_delay``),
+    one duplicate attempt is started and whichever succeeds first wins.
+    ``hedge_gate``, when given, must return True for the hedge to start
+    (e.g. a rate limiter token being free). Only use this for idempotent
+    calls. At the deadline, attempts still queued are cancelled; one
+    already running is abandoned, not killed, and finishes in the background.
+    """
+
+    # Below this many samples the percentile is too noisy to hedge on
+    MIN_SAMPLES = 20
+
+    def __init__(self, max_workers: int, deadline: float, hedge: bool,
+                 hedge_percentile: float = 95.0, min_hedge_delay: float = 0.5):
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upstream')
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadlines_exceeded = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency) < self.MIN_SAMPLES:
+            return None
+        return max(self.min_hedge_delay, self.latency.percentile(self.hedge_percentile))
+
+    def _timed(self, fn: Callable, args, kwargs):
+        started = time.time()
+        result = fn(*args, **kwargs)
+        return result, time.time() - started
+
+    def call(self, fn: Callable, *args, hedge_gate: Optional[Callable[[], bool]] = None, **kwargs) -> Any:
+        with self._lock:
+            self.calls += 1
+
+        started = time.time()
+        deadline_at = started + self.deadline if self.deadline > 0 else None
+        hedge_delay = self.hedge_delay()
+
+        if deadline_at is None and hedge_delay is None:
+            result, elapsed = self._timed(fn, args, kwargs)
+            self.latency.record(elapsed)
+            return result
+
+        primary = self._executor.submit(self._timed, fn, args, kwargs)
+        attempts = {primary}
+
+        if hedge_delay is not None:
+            first_wait = hedge_delay if deadline_at is None else min(hedge_delay, deadline_at - time.time())
+            done, _ = wait(attempts, timeout=max(0.0, first_wait))
+            if (not done and (deadline_at is None or time.time() < deadline_at)
+                    and (hedge_gate is None or hedge_gate())):
+                with self._lock:
+                    self.hedges += 1
+                logger.info(f"🪝 Hedging slow upstream call after {hedge_delay * 1000:.0f}ms")
+                attempts.add(self._executor.submit(self._timed, fn, args, kwargs))
+
+        last_error: Optional[BaseException] = None
+        pending = set(attempts)
+        while pending:
+            timeout = None if deadline_at is None else max(0.0, deadline_at - time.time())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Past the deadline: nobody is waiting for attempts that haven't started yet
+                for other in pending:
+                    other.cancel()
+                break
+            for future in done:
+                error = future.exception()
+                if error is not None:
+                    last_error = error
+                    continue
+                result, elapsed = future.result()
+                self.latency.record(elapsed)
+                if future is not primary:
+                    with self._lock:
+                        self.hedge_wins += 1
+                for other in pending:
+                    other.cancel()
+                return result
+
+        if last_error is not None and not pending:
+            raise last_error
+
+        with self._lock:
+            self.deadlines_exceeded += 1
+        # Count the abandoned call at the deadline so the percentiles see it
+        self.latency.record(time.time() - started)
+        raise DeadlineExceeded(f'Upstream call exceeded {self.deadline}s deadline')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {
+                'calls': self.calls,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'deadlines_exceeded': self.deadlines_exceeded
+            }
+        delay = self.hedge_delay()
+        return {
+            'deadline_s': self.deadline,
+            'hedging': self.hedge,
+            'hedge_delay_ms': round(delay * 1000, 1) if delay is not None else None,
+            **counters,
+            'latency': self.latency.stats()
+        }
@@ -0,0 +1,176 @@
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Firestore caps a batched write at 500 operations
+FIRESTORE_BATCH_LIMIT = 500
+
+
+class SharedMatchCache:
+    """Match cache tier in a Firestore collection, shared by every instance.
+
+    Documents are keyed by a hash of the normalized cache key and carry
+    their own expiry, so positive and negative entries keep the TTLs they
+    were written with. ``expiresAt`` is a timestamp, so a Firestore TTL
+    policy on it deletes expired documents. Reads for a whole track list
+    go through one ``get_all`` call; writes are queued and committed in
+    batches every ``flush_interval`` seconds.
+    """
+
+    def __init__(self, db: Any, collection: str, ttl: int, negative_ttl: int, flush_interval: float = 2.0):
+        self.db = db
+        self.collection = collection
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='shared-cache-writer', daemon=True)
+        self._thread.start()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.bulk_reads = 0
+        self.documents_written = 0
+        self.commits = 0
+        self.errors = 0
+
+    @staticmethod
+    def doc_id(key: str) -> str:
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _ref(self, key: str):
+        return self.db.collection(self.collection).document(self.doc_id(key))
+
+    @staticmethod
+    def _expiry(data: Dict[str, Any]) -> float:
+        """``expiresAt`` as epoch seconds (older documents stored a float)"""
+        expires_at = data.get('expiresAt', 0)
+        if isinstance(expires_at, datetime):
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            return expires_at.timestamp()
+        return float(expires_at or 0)
+
+    def _entry(self, data: Optional[Dict[str, Any]], now: float) -> Optional[Dict[str, Any]]:
+        """Count and unpack one document; None when missing or expired"""
+        with self._lock:
+            if not data or self._expiry(data) <= now:
+                self.misses += 1
+                metrics.CACHE_LOOKUPS.labels('shared', 'miss').inc()
+                return None
+            if data.get('result') is None:
+                self.negative_hits += 1
+                metrics.CACHE_LOOKUPS.labels('shared', 'negative_hit').inc()
+            else:
+                self.hits += 1
+                metrics.CACHE_LOOKUPS.labels('shared', 'hit').inc()
+        return {'result': data.get('result'), 'message': data.get('message', ''), 'expires_at': self._expiry(data)}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return ``{'result', 'message', 'expires_at'}`` for a fresh entry, or None on a miss"""
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending:
+            return self._entry(pending, time.time())
+        try:
+            with metrics.timer(metrics.FIRESTORE_READ_SECONDS, operation='match_cache_get'):
+                doc = self._ref(key).get()
+            return self._entry(doc.to_dict() if doc.exists else None, time.time())
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Shared match cache read failed: {str(e)}")
+            return None
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fresh entries for many keys in one bulk read (missing keys are left out)"""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        by_doc_id = {self.doc_id(key): key for key in keys}
+        found: Dict[str, Dict[str, Any]] = {}
+        now = time.time()
+        try:
+            self.bulk_reads += 1
+            with metrics.timer(metrics.FIRESTORE_READ_SECONDS, operation='match_cache_get_all'):
+                for doc in self.db.get_all([self._ref(key) for key in keys]):
+                    if doc.exists and doc.id in by_doc_id:
+                        found[by_doc_id[doc.id]] = doc.to_dict()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"⚠️ Shared match cache bulk read failed: {str(e)}")
+            return {}
+
+        entries = {}
+        for key in keys:
+            entry = self._entry(found.get(key), now)
+            if entry:
+                entries[key] = entry
+        return entries
+
+    def set(self, key: str, result: Optional[Dict[str, Any]], message: str, ttl: Optional[int] = None) -> None:
+        """Queue a match for the next batched write"""
+        if ttl is None:
+            ttl = self.ttl if result is not None else self.negative_ttl
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._pending[key] = {
+                'key': key,
+                'result': result,
+                'message': message,
+                'expiresAt': now + timedelta(seconds=ttl),
+                'updatedAt': now
+            }
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            items = list(pending.items())
+            for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+                chunk = items[start:start + FIRESTORE_BATCH_LIMIT]
+                try:
+                    batch = self.db.batch()
+                    for key, data in chunk:
+                        batch.set(self._ref(key), data)
+                    batch.commit()
+                    self.commits += 1
+                    self.documents_written += len(chunk)
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"⚠️ Shared match cache write failed for {len(chunk)} entries: {str(e)}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'enabled': True,
+            'collection': self.collection,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_rate': round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+            'bulk_reads': self.bulk_reads,
+            'pending_writes': pending,
+            'documents_written': self.documents_written,
+            'commits': self.commits,
+            'errors': self.errors
+        }
@@ -0,0 +1,85 @@
+from playlist_sync import plan_sync
+
+
+def _entry(video_id, title, artist, set_video_id=None):
+    return {
+        'videoId': video_id,
+        'setVideoId': set_video_id or f'set-{video_id}',
+        'title': title,
+        'artists': [{'name': artist}]
+    }
+
+
+PLAYLIST = [
+    _entry('vid-queen', 'Bohemian Rhapsody - Remastered 2011', 'Queen'),
+    _entry('vid-abba', 'Dancing Queen', 'ABBA'),
+    _entry('vid-old', 'Song Removed From Source', 'Someone')
+]
+SOURCE = [
+    {'title': 'Bohemian Rhapsody', 'artist': 'Queen'},
+    {'title': 'Dancing Queen', 'artist': 'ABBA'},
+    {'title': 'Brand New Song', 'artist': 'New Artist'}
+]
+
+
+def _plan(source=SOURCE, playlist=PLAYLIST):
+    return plan_sync(source, playlist, lambda track: None, local_threshold=0.8, min_artist=0.6, max_fuzzy_pairs=1000)
+
+
+def _found(video_id):
+    return {'success': True, 'result': {'videoId': video_id}}
+
+
+def test_plan_keeps_same_title_and_searches_the_rest():
+    plan = _plan()
+    assert plan.kept[1]['videoId'] == 'vid-abba'
+    assert sorted(plan.unresolved) == [0, 2]
+
+
+def test_searched_tracks_already_in_playlist_are_kept_and_new_ones_added():
+    plan = _plan()
+    assert plan.record_search(0, _found('vid-queen'))['status'] == 'kept'
+    assert plan.record_search(2, _found('vid-new'))['status'] == 'to_add'
+    assert plan.to_add == [(2, 'vid-new')]
+    assert [t['videoId'] for t in plan.removals()] == ['vid-old']
+
+
+def test_failed_search_blocks_removals():
+    # The remastered entry only matches through the search; when that search
+    # fails, the entry is unclaimed but must not be removed
+    plan = _plan()
+    status = plan.record_search(0, {'success': False, 'error': 'HTTP 503'})
+    plan.record_search(2, _found('vid-new'))
+    assert status == {'index': 0, 'status': 'error', 'error': 'HTTP 503'}
+    assert 'vid-queen' in [t['videoId'] for t in plan.extra()]
+    assert plan.failed == [0]
+    assert plan.removals() == []
+    assert plan.to_add == [(2, 'vid-new')]
+
+
+def test_not_found_track_keeps_its_plausible_entry():
+    # The search found nothing for a track whose entry only matches through
+    # the search; that entry must survive while unrelated extras still go
+    plan = _plan()
+    assert plan.record_search(0, {'success': True, 'result': None})['status'] == 'not_found'
+    plan.record_search(2, _found('vid-new'))
+    assert [t['videoId'] for t in plan.removals()] == ['vid-old']
+    assert [t['videoId'] for t in plan.protected] == ['vid-queen']
+
+
+def test_transient_no_match_counts_as_failed():
+    # Fallback queries errored: "no match" is not trustworthy, so nothing is removed
+    plan = _plan()
+    status = plan.record_search(0, {'success': True, 'result': None, 'transient': True})
+    plan.record_search(2, _found('vid-new'))
+    assert status['status'] == 'error'
+    assert plan.failed == [0]
+    assert plan.removals() == []
+
+
+def test_entries_without_set_video_id_are_never_removed():
+    playlist = PLAYLIST + [{'videoId': 'vid-nosvid', 'title': 'Unremovable', 'artists': [{'name': 'X'}]}]
+    plan = _plan(playlist=playlist)
+    plan.record_search(0, _found('vid-queen'))
+    plan.record_search(2, _found('vid-new'))
+    assert [t['videoId'] for t in plan.removals()] == ['vid-old']
@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process coordination
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_TOKEN_URL = 'https://oauth2.googleapis.com/token'
+
+
+def refresh_with_google(refresh_token: str, client_id: str, client_secret: str) -> Dict[str, Any]:
+    """Exchange a refresh token for a new access token at Google's OAuth endpoint"""
+    response = requests.post(
+        GOOGLE_TOKEN_URL,
+        data={
+            'grant_type': 'refresh_token',
+            'refresh_token': refresh_token,
+            'client_id': client_id,
+            'client_secret': client_secret
+        },
+        timeout=30
+    )
+    if response.status_code != 200:
+        raise Exception(f'Token refresh failed: {response.status_code} - {response.text}')
+    return response.json()
+
+
+class TokenManager:
+    """Keeps the OAuth token fresh ahead of expiry for every YTMusic client.
+
+    A background thread checks the token file every ``check_interval``
+    seconds and refreshes when it's within ``refresh_margin`` of
+    ``expires_at``. An exclusive ``flock`` on ``<oauth_file>.lock`` makes
+    sure only one worker process refreshes; the others notice the newer
+    file on their next check. The file is replaced atomically, and new
+    credentials are swapped into the attached clients in place, so
+    requests never wait on a refresh or read a half-written file.
+    """
+
+    def __init__(self, oauth_file: str, refresh_fn: Callable[[str], Dict[str, Any]],
+                 refresh_margin: float, check_interval: float):
+        self.oauth_file = oauth_file
+        self.lock_file = oauth_file + '.lock'
+        self.refresh_fn = refresh_fn
+        self.refresh_margin = refresh_margin
+        self.check_interval = check_interval
+        self._clients: List[Any] = []
+        self._applied_expires_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_refresh_at = 0.0
+        self.last_error: Optional[str] = None
+
+    def read_token(self) -> Dict[str, Any]:
+        with open(self.oauth_file, 'r') as f:
+            return json.load(f)
+
+    def _write_token(self, token: Dict[str, Any]) -> None:
+        """Write the token file via rename so readers see the old or the new file, never a partial one"""
+        directory = os.path.dirname(os.path.abspath(self.oauth_file))
+        fd, tmp_path = tempfile.mkstemp(prefix='.oauth-', suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(token, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.oauth_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def _needs_refresh(self, token: Dict[str, Any]) -> bool:
+        return token.get('expires_at', 0) - time.time() < self.refresh_margin
+
+    def ensure_fresh(self, block: bool = False) -> bool:
+        """Refresh the token if it is close to expiry.
+
+        With ``block=False`` a worker that finds another process holding the
+        refresh lock skips this round. Returns True while the current token
+        is still usable.
+        """
+        token = self.read_token()
+        if self._needs_refresh(token):
+            with open(self.lock_file, 'a') as lock:
+                if fcntl:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | (0 if block else fcntl.LOCK_NB))
+                    except BlockingIOError:
+                        logger.info("ℹ️ Another worker is refreshing the OAuth token")
+                        return token.get('expires_at', 0) > time.time()
+                try:
+                    # Another worker may have refreshed while we waited for the lock
+                    token = self.read_token()
+                    if self._needs_refresh(token):
+                        token = self._refresh(token)
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+        self._apply(token)
+        return token.get('expires_at', 0) > time.time()
+
+    def _refresh(self, token: Dict[str, Any]) -> Dict[str, Any]:
+        refresh_token = token.get('refresh_token')
+        if not refresh_token:
+            raise Exception('No refresh token available. Please re-authenticate.')
+
+        try:
+            fresh = self.refresh_fn(refresh_token)
+            if 'access_token' not in fresh:
+                raise Exception(f"Unexpected refresh response: {fresh.get('error_description') or fresh.get('error') or fresh}")
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.error(f"❌ OAuth token refresh failed: {str(e)}")
+            return token
+
+        token = dict(token)
+        token['access_token'] = fresh['access_token']
+        token['expires_in'] = fresh['expires_in']
+        token['expires_at'] = int(time.time()) + int(fresh['expires_in'])
+        self._write_token(token)
+
+        self.refreshes += 1
+        self.last_refresh_at = time.time()
+        self.last_error = None
+        logger.info(f"✅ OAuth token refreshed, valid until {datetime.fromtimestamp(token['expires_at']).isoformat()}")
+        return token
+
+    def attach(self, clients: List[Any]) -> None:
+        """Manage the tokens of these YTMusic clients"""
+        with self._lock:
+            self._clients = list(clients)
+            self._applied_expires_at = 0.0
+            for client in self._clients:
+                client_token = getattr(client, '_token', None)
+                if client_token is not None and hasattr(client_token, '_local_cache'):
+                    # This manager owns the file; don't let clients rewrite it non-atomically
+                    client_token._local_cache = None
+        self._apply(self.read_token())
+
+    def _apply(self, token: Dict[str, Any]) -> None:
+        """Swap newer credentials into the live clients"""
+        expires_at = token.get('expires_at', 0)
+        with self._lock:
+            if expires_at <= self._applied_expires_at:
+                return
+            for client in self._clients:
+                client_token = getattr(client, '_token', None)
+                if client_token is None:
+                    continue
+                client_token.expires_at = expires_at
+                client_token.expires_in = token.get('expires_in', 0)
+                client_token.access_token = token['access_token']
+            self._applied_expires_at = expires_at
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='token-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.ensure_fresh()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"❌ Background token check failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            expires_at = self.read_token().get('expires_at', 0)
+        except Exception:
+            expires_at = 0
+        return {
+            'expires_at': datetime.fromtimestamp(expires_at).isoformat() if expires_at else None,
+            'expires_in_s': int(expires_at - time.time()) if expires_at else None,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'last_refresh_at': datetime.fromtimestamp(self.last_refresh_at).isoformat() if self.last_refresh_at else None,
+            'last_error': self.last_error,
+            'background_thread': bool(self._thread and self._thread.is_alive())
+        }